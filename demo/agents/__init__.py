@@ -2,7 +2,7 @@
 Agents package for LocalMind Collective Demo
 """
 
-from .base import PresentationAgent, CURRENT_DATE, OLLAMA_HOST
+from .base import PresentationAgent, CURRENT_DATE, OLLAMA_HOST, get_session, close_session, embed_text
 from .principal import PrincipalSynthesizer
 from .domain import DomainSpecialist
 from .web import WebHarvester
@@ -14,6 +14,9 @@ __all__ = [
     'PresentationAgent', 
     'CURRENT_DATE', 
     'OLLAMA_HOST',
+    'get_session',
+    'close_session',
+    'embed_text',
     'PrincipalSynthesizer',
     'DomainSpecialist',
     'WebHarvester',
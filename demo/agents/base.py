@@ -3,38 +3,189 @@ Base classes for all presentation agents with production enhancements
 """
 
 import os
-import json
+import sys
 import time
 import asyncio
-from typing import Dict, Any, Optional, Callable
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from datetime import datetime
 from loguru import logger
 import aiohttp
+import orjson
 from pathlib import Path
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+try:
+    import aiodns  # noqa: F401 - enables aiohttp.AsyncResolver
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
 # Core enhancement imports
 from .core.prompting import StructuredPrompt, PromptValidator, PromptOptimizer
 from .core.resilience import ResilientAgentWrapper
 from .core.examples import PromptExampleBuilder
-from .core.dynamic import AdaptiveTemperatureController, TokenOptimizer
+from .core.dynamic import AdaptiveTemperatureController, TokenOptimizer, ResponseCache
+
+ENV_PATH = Path(__file__).parent.parent.parent / ".env"
+
+
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """Load environment variables from the root .env file, at most once per process"""
+    load_dotenv(ENV_PATH)
 
-# Load environment variables from root .env file
-root_dir = Path(__file__).parent.parent.parent
-env_path = root_dir / ".env"
-load_dotenv(env_path)
+
+# Settings read from the environment below; all are documented in .env.example
+_ENV_SETTINGS = ("OLLAMA_HOST", "OLLAMA_QUANTIZATION", "OLLAMA_KEEP_ALIVE", "OLLAMA_EMBED_MODEL")
+
+# Skip reading .env only when the environment already sets everything (containers, CI)
+if not all(name in os.environ for name in _ENV_SETTINGS):
+    load_env()
 
 CURRENT_DATE = datetime.now().strftime("%B %d, %Y")
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 
+# Optional quantization override (e.g. "q8_0") and how long Ollama keeps models loaded
+OLLAMA_QUANTIZATION = os.getenv("OLLAMA_QUANTIZATION")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Small embedding model used to match paraphrased queries against past research
+OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
+# Explicit Ollama tags per (model, quantization); the default tags are already q4_K_M
+MODEL_QUANTIZATIONS = {
+    ("deepseek-r1:8b", "q4_K_M"): "deepseek-r1:8b-0528-qwen3-q4_K_M",
+    ("deepseek-r1:8b", "q8_0"): "deepseek-r1:8b-0528-qwen3-q8_0",
+    ("qwen3:8b", "q4_K_M"): "qwen3:8b-q4_K_M",
+    ("qwen3:8b", "q8_0"): "qwen3:8b-q8_0",
+    ("qwen3:4b", "q4_K_M"): "qwen3:4b-q4_K_M",
+    ("qwen3:4b", "q8_0"): "qwen3:4b-q8_0",
+    ("phi4-mini", "q4_K_M"): "phi4-mini:3.8b-q4_K_M",
+    ("phi4-mini", "q8_0"): "phi4-mini:3.8b-q8_0",
+}
+
+# Read size for Ollama's NDJSON stream
+STREAM_CHUNK_SIZE = 4096
+
+# Max stream events buffered for a slow frontend before reading from Ollama pauses
+STREAM_QUEUE_SIZE = 256
+
+# Shared HTTP session so Ollama requests reuse pooled keep-alive connections
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+# Set once Ollama reports the embedding model missing, so later queries skip the round trip
+_EMBED_UNAVAILABLE = False
+
+
+# unix:// hosts are reached over a Unix socket; requests still need an HTTP URL
+OLLAMA_BASE_URL = "http://localhost" if OLLAMA_HOST.startswith("unix://") else OLLAMA_HOST
+
+
+def _build_connector() -> aiohttp.BaseConnector:
+    """Build the pooled connector for Ollama requests"""
+    if OLLAMA_HOST.startswith("unix://"):
+        return aiohttp.UnixConnector(path=OLLAMA_HOST[len("unix://"):], limit=32, keepalive_timeout=75)
+        
+    options = {
+        "limit": 32,
+        "limit_per_host": 16,
+        "keepalive_timeout": 75,
+        "use_dns_cache": True,
+        "ttl_dns_cache": 300
+    }
+    # c-ares doesn't reliably consult /etc/hosts, so only use it for remote hosts
+    if HAS_AIODNS and urlparse(OLLAMA_HOST).hostname not in ("localhost", "127.0.0.1", "::1"):
+        options["resolver"] = aiohttp.AsyncResolver()
+    return aiohttp.TCPConnector(**options)
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Get the shared aiohttp session, creating it lazily on first use."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(connector=_build_connector())
+    return _SESSION
+
+
+async def _iter_ndjson(content: aiohttp.StreamReader):
+    """Yield decoded objects from an NDJSON stream, buffering lines split across reads"""
+    buffer = bytearray()
+    async for data in content.iter_chunked(STREAM_CHUNK_SIZE):
+        buffer.extend(data)
+        start = 0
+        while (newline := buffer.find(b"\n", start)) != -1:
+            line = buffer[start:newline]
+            start = newline + 1
+            if line.strip():
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+        # Drop consumed lines once per read rather than once per line
+        if start:
+            del buffer[:start]
+    if buffer.strip():
+        try:
+            yield orjson.loads(buffer)
+        except orjson.JSONDecodeError:
+            pass
+
+
+async def _drain_stream(queue: asyncio.Queue, stream_callback):
+    """Forward queued stream events to the callback in order until a None sentinel"""
+    while (event := await queue.get()) is not None:
+        try:
+            await stream_callback(event)
+        except Exception as e:
+            logger.warning(f"Stream callback failed: {e}")
+
+
+async def embed_text(text: str, timeout: float = 10.0) -> Optional[List[float]]:
+    """Embed text with the Ollama embedding model; returns None if embeddings are unavailable"""
+    global _EMBED_UNAVAILABLE
+    if _EMBED_UNAVAILABLE:
+        return None
+        
+    payload = {"model": OLLAMA_EMBED_MODEL, "input": text, "keep_alive": OLLAMA_KEEP_ALIVE}
+    try:
+        session = await get_session()
+        async with session.post(f"{OLLAMA_BASE_URL}/api/embed", json=payload,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status == 404:
+                logger.warning(f"Embedding model {OLLAMA_EMBED_MODEL} not available; "
+                               f"run 'ollama pull {OLLAMA_EMBED_MODEL}' to enable semantic caching")
+                _EMBED_UNAVAILABLE = True
+                return None
+            if response.status != 200:
+                logger.debug(f"Embedding request failed with status {response.status}")
+                return None
+            data = orjson.loads(await response.read())
+            embeddings = data.get("embeddings")
+            return embeddings[0] if embeddings else None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Embedding request failed: {e}")
+        return None
+
+
+async def close_session():
+    """Close the shared aiohttp session (call on application shutdown)."""
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
 
 class PresentationAgent:
     """Enhanced base class with production features - resilience, optimization, and learning."""
     
     def __init__(self, name: str, model: str, role: str, temperature: float = 0.3):
-        self.name = name
-        self.model = model
-        self.role = role
+        # Interned so per-agent dict lookups across components compare by identity
+        self.name = sys.intern(name)
+        self.model = sys.intern(model)
+        self.role = sys.intern(role)
         self.base_temperature = temperature
         self.temperature = temperature
         self.timeout = 60  # Base timeout for streaming
@@ -45,16 +196,26 @@ class PresentationAgent:
         self.token_optimizer = TokenOptimizer()
         self.temperature_controller = AdaptiveTemperatureController()
         self.example_builder = PromptExampleBuilder()
+        self.response_cache = ResponseCache()
         
         # Performance tracking
-        self.execution_history = []
+        self.execution_history = deque(maxlen=100)
         self.error_count = 0
         self.success_count = 0
         
-    async def run(self, prompt: str, stream_callback=None, context: Dict[str, Any] = None) -> str:
+        # Running aggregates over the last 10 executions
+        self._recent_window = deque(maxlen=10)
+        self._recent_time_sum = 0.0
+        self._recent_token_sum = 0
+        self._window_successes = 0
+        self._last5_successes = 0
+        
+    async def run(self, prompt: str, stream_callback=None, context: Dict[str, Any] = None,
+                  timeout: Optional[float] = None) -> str:
         """Enhanced run method with optimization and adaptive behavior."""
         start_time = time.time()
         context = context or {}
+        timeout = timeout or self.timeout
         
         try:
             # Optimize prompt
@@ -63,62 +224,68 @@ class PresentationAgent:
             # Get adaptive temperature
             self.temperature = self._get_adaptive_temperature(context)
             
+            # Resolve the Ollama tag for the requested quantization
+            model_tag = self._resolve_model_tag(context.get("quantization", OLLAMA_QUANTIZATION))
+            
             # Send initial thinking update
             if stream_callback:
                 await stream_callback({
                     "type": "agent_thinking",
                     "agent": self.name,
-                    "model": self.model,
+                    "model": model_tag,
                     "temperature": self.temperature
                 })
             
+            # Serve identical low-temperature requests from cache
+            max_tokens = context.get("max_tokens", 10000)
+            use_cache = not context.get("bypass_cache", False) and self.temperature <= 0.7
+            if use_cache:
+                cached = self.response_cache.get(model_tag, self.temperature, max_tokens, optimized_prompt)
+                if cached is not None:
+                    return await self._replay_cached(cached, start_time, stream_callback)
+            
             # Use Ollama HTTP API for streaming
-            url = f"{OLLAMA_HOST}/api/generate"
+            url = f"{OLLAMA_BASE_URL}/api/generate"
             payload = {
-                "model": self.model,
+                "model": model_tag,
                 "prompt": optimized_prompt,
                 "stream": True,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
                 "options": {
                     "temperature": self.temperature,
-                    "num_predict": context.get("max_tokens", 10000)
+                    "num_predict": max_tokens
                 }
             }
+            # Have Ollama constrain sampling to valid JSON rather than hoping the prompt holds
+            if context.get("response_format") == "json":
+                payload["format"] = "json"
             
-            full_response = ""
-            token_count = 0
+            # Forward stream chunks through a bounded queue so a slow client
+            # doesn't stall reading from Ollama; one drain task keeps them in order
+            stream_queue = None
+            drain_task = None
+            if stream_callback:
+                stream_queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+                drain_task = asyncio.create_task(_drain_stream(stream_queue, stream_callback))
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            try:
+                session = await get_session()
+                async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
                     if response.status == 200:
-                        async for line in response.content:
-                            if line:
-                                try:
-                                    data = json.loads(line.decode('utf-8'))
-                                    if 'response' in data:
-                                        chunk = data['response']
-                                        full_response += chunk
-                                        # Only count tokens when we have word boundaries
-                                        if chunk and (chunk[-1].isspace() or chunk[0].isspace()):
-                                            token_count = len(full_response.split())
-                                        
-                                        # Stream the actual text to frontend
-                                        if stream_callback and chunk:
-                                            await stream_callback({
-                                                "type": "agent_stream",
-                                                "agent": self.name,
-                                                "chunk": chunk,
-                                                "tokens": token_count
-                                            })
-                                        
-                                    if data.get('done', False):
-                                        break
-                                except json.JSONDecodeError:
-                                    continue
+                        if stream_queue is None:
+                            full_response, token_count = await self._consume_stream_quiet(response)
+                        else:
+                            full_response, token_count = await self._consume_stream_emit(response, stream_queue)
                     else:
                         error_text = await response.text()
                         logger.error(f"{self.name} HTTP error {response.status}: {error_text}")
                         return f"Error: {self.name} failed with status {response.status}"
-            
+            finally:
+                # Flush pending chunks before any completion or error event
+                if drain_task is not None:
+                    await stream_queue.put(None)
+                    await drain_task
+        
             # Send completion update
             if stream_callback:
                 await stream_callback({
@@ -132,10 +299,13 @@ class PresentationAgent:
             execution_time = time.time() - start_time
             self._record_execution(True, execution_time, token_count)
             
+            if use_cache and full_response:
+                self.response_cache.store(model_tag, self.temperature, max_tokens, optimized_prompt, full_response.strip())
+            
             return full_response.strip()
             
         except asyncio.TimeoutError:
-            logger.warning(f"{self.name} timed out after {self.timeout}s")
+            logger.warning(f"{self.name} timed out after {timeout}s")
             self._record_execution(False, time.time() - start_time, 0)
             
             if stream_callback:
@@ -170,6 +340,73 @@ class PresentationAgent:
                 })
             return f"{self.name} error: {str(e)}"
     
+    async def _consume_stream_quiet(self, response: aiohttp.ClientResponse) -> Tuple[str, int]:
+        """Collect a streamed response when nobody is listening for chunks"""
+        parts = []
+        async for data in _iter_ndjson(response.content):
+            if 'response' in data:
+                parts.append(data['response'])
+            if data.get('done', False):
+                break
+                
+        full_response = "".join(parts)
+        return full_response, len(full_response.split())
+        
+    async def _consume_stream_emit(self, response: aiohttp.ClientResponse,
+                                   stream_queue: asyncio.Queue) -> Tuple[str, int]:
+        """Collect a streamed response, queueing each chunk for the frontend"""
+        parts = []
+        token_count = 0
+        in_word = False
+        
+        async for data in _iter_ndjson(response.content):
+            if 'response' in data:
+                chunk = data['response']
+                if chunk:
+                    parts.append(chunk)
+                    
+                    # Count words incrementally; a chunk continuing the previous word adds none
+                    new_words = len(chunk.split())
+                    if in_word and new_words and not chunk[0].isspace():
+                        new_words -= 1
+                    token_count += new_words
+                    in_word = not chunk[-1].isspace()
+                    
+                    # Stream the actual text to frontend
+                    await stream_queue.put({
+                        "type": "agent_stream",
+                        "agent": self.name,
+                        "chunk": chunk,
+                        "tokens": token_count
+                    })
+                    
+            if data.get('done', False):
+                break
+                
+        return "".join(parts), token_count
+        
+    async def _replay_cached(self, response: str, start_time: float, stream_callback=None) -> str:
+        """Return a cached response, replaying it to the frontend as a single stream chunk"""
+        token_count = len(response.split())
+        logger.debug(f"Response cache hit for {self.name}")
+        
+        if stream_callback:
+            await stream_callback({
+                "type": "agent_stream",
+                "agent": self.name,
+                "chunk": response,
+                "tokens": token_count
+            })
+            await stream_callback({
+                "type": "agent_response",
+                "agent": self.name,
+                "tokens": token_count,
+                "complete": True
+            })
+            
+        self._record_execution(True, time.time() - start_time, token_count)
+        return response
+        
     def _optimize_prompt(self, prompt: str, context: Dict[str, Any]) -> str:
         """Optimize prompt based on context"""
         # Add examples if available
@@ -195,6 +432,12 @@ class PresentationAgent:
             
         return prompt
         
+    def _resolve_model_tag(self, quantization: Optional[str]) -> str:
+        """Map the agent's model to an explicitly quantized Ollama tag if one is requested"""
+        if not quantization:
+            return self.model
+        return MODEL_QUANTIZATIONS.get((self.model, quantization), self.model)
+        
     def _get_adaptive_temperature(self, context: Dict[str, Any]) -> float:
         """Get adaptive temperature based on context"""
         return self.temperature_controller.get_optimal_temperature(
@@ -207,21 +450,34 @@ class PresentationAgent:
         
     def _record_execution(self, success: bool, execution_time: float, tokens: int):
         """Record execution for performance tracking"""
-        self.execution_history.append({
-            "timestamp": datetime.now().isoformat(),
+        entry = {
+            "timestamp": time.time(),
             "success": success,
             "execution_time": execution_time,
             "tokens": tokens
-        })
+        }
+        self.execution_history.append(entry)
         
         if success:
             self.success_count += 1
         else:
             self.error_count += 1
             
-        # Keep only recent history
-        if len(self.execution_history) > 100:
-            self.execution_history = self.execution_history[-100:]
+        # Update running aggregates before the window shifts
+        window = self._recent_window
+        if len(window) >= 5:
+            self._last5_successes -= window[-5]["success"]
+        if len(window) == window.maxlen:
+            evicted = window[0]
+            self._recent_time_sum -= evicted["execution_time"]
+            self._recent_token_sum -= evicted["tokens"]
+            self._window_successes -= evicted["success"]
+            
+        window.append(entry)
+        self._recent_time_sum += execution_time
+        self._recent_token_sum += tokens
+        self._window_successes += success
+        self._last5_successes += success
             
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get agent performance metrics"""
@@ -235,30 +491,32 @@ class PresentationAgent:
                 "total_executions": 0
             }
             
-        recent_executions = self.execution_history[-10:] if self.execution_history else []
+        recent_count = len(self._recent_window)
         
         return {
             "success_rate": self.success_count / total,
-            "average_execution_time": sum(e["execution_time"] for e in recent_executions) / len(recent_executions) if recent_executions else 0,
-            "average_tokens": sum(e["tokens"] for e in recent_executions) / len(recent_executions) if recent_executions else 0,
+            "average_execution_time": self._recent_time_sum / recent_count,
+            "average_tokens": self._recent_token_sum / recent_count,
             "total_executions": total,
             "recent_trend": self._calculate_trend()
         }
         
     def _calculate_trend(self) -> str:
         """Calculate performance trend"""
-        if len(self.execution_history) < 5:
+        window = self._recent_window
+        if len(window) < 5:
             return "insufficient_data"
             
-        recent = self.execution_history[-5:]
-        older = self.execution_history[-10:-5] if len(self.execution_history) >= 10 else self.execution_history[:5]
-        
-        recent_success_rate = sum(1 for e in recent if e["success"]) / len(recent)
-        older_success_rate = sum(1 for e in older if e["success"]) / len(older)
+        recent_success_rate = self._last5_successes / 5
+        if len(window) == window.maxlen:
+            older_success_rate = (self._window_successes - self._last5_successes) / 5
+        else:
+            # Fewer than 10 executions: compare against the first five
+            older_success_rate = sum(window[i]["success"] for i in range(5)) / 5
         
         if recent_success_rate > older_success_rate + 0.1:
             return "improving"
         elif recent_success_rate < older_success_rate - 0.1:
             return "degrading"
         else:
-            return "stable"
\ No newline at end of file
+            return "stable"
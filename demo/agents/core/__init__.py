@@ -11,7 +11,8 @@ from .dynamic import (
     AdaptiveTemperatureController,
     DynamicPromptBuilder,
     TokenOptimizer,
-    PromptCache
+    PromptCache,
+    ResponseCache
 )
 
 __all__ = [
@@ -26,5 +27,6 @@ __all__ = [
     'AdaptiveTemperatureController',
     'DynamicPromptBuilder',
     'TokenOptimizer',
-    'PromptCache'
+    'PromptCache',
+    'ResponseCache'
 ]
\ No newline at end of file
@@ -2,19 +2,27 @@
 Agent communication protocol for context sharing and coordination
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
 import json
+import time
+import asyncio
+import re
+from collections import OrderedDict
 from loguru import logger
 
 
-@dataclass
+# Warnings from a previous agent that signal the next agent can be skipped
+_SKIP_RE = re.compile(r'skip|not needed', re.IGNORECASE)
+
+
+@dataclass(slots=True)
 class AgentHandoff:
     """Structured handoff package between agents"""
     from_agent: str
     to_agent: str
-    timestamp: datetime = field(default_factory=datetime.now)
+    timestamp: float = field(default_factory=time.time)
     query: str = ""
     key_findings: Dict[str, Any] = field(default_factory=dict)
     recommendations: List[str] = field(default_factory=list)
@@ -22,30 +30,29 @@ class AgentHandoff:
     confidence: float = 0.8
     context: Dict[str, Any] = field(default_factory=dict)
     priority_aspects: List[str] = field(default_factory=list)
+    _rendered: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     def to_prompt_context(self) -> str:
-        """Convert handoff to prompt context"""
-        context_parts = [
-            f"Previous agent: {self.from_agent}",
-            f"Confidence level: {self.confidence}"
-        ]
+        """Convert handoff to prompt context (rendered once, handoffs aren't mutated after creation)"""
+        if self._rendered is not None:
+            return self._rendered
+            
+        context_parts = [f"Previous agent: {self.from_agent}\n\nConfidence level: {self.confidence}"]
         
         if self.key_findings:
-            findings_str = "\n".join(f"- {k}: {v}" for k, v in self.key_findings.items())
-            context_parts.append(f"Key findings:\n{findings_str}")
+            context_parts.append("Key findings:\n" + "\n".join(f"- {k}: {v}" for k, v in self.key_findings.items()))
             
         if self.recommendations:
-            rec_str = "\n".join(f"- {r}" for r in self.recommendations)
-            context_parts.append(f"Recommendations:\n{rec_str}")
+            context_parts.append("Recommendations:\n" + "\n".join(f"- {r}" for r in self.recommendations))
             
         if self.warnings:
-            warn_str = "\n".join(f"- {w}" for w in self.warnings)
-            context_parts.append(f"Warnings:\n{warn_str}")
+            context_parts.append("Warnings:\n" + "\n".join(f"- {w}" for w in self.warnings))
             
         if self.priority_aspects:
             context_parts.append(f"Priority aspects to investigate: {', '.join(self.priority_aspects)}")
             
-        return "\n\n".join(context_parts)
+        self._rendered = "\n\n".join(context_parts)
+        return self._rendered
 
 
 class AgentCommunicationProtocol:
@@ -54,11 +61,21 @@ class AgentCommunicationProtocol:
     def __init__(self):
         self.shared_context: Dict[str, AgentHandoff] = {}
         self.agent_insights: Dict[str, List[Dict]] = {}
+        self._insight_search_text: Dict[str, List[str]] = {}  # Lowercased repr per insight
         self.conversation_history: List[Dict] = []
         self.global_context: Dict[str, Any] = {}
         
+        # Running handoff aggregates for get_conversation_summary
+        self._handoff_count = 0
+        self._handoff_confidence_sum = 0.0
+        self._agents_involved: Dict[str, None] = {}  # Insertion-ordered set
+        
     async def agent_handoff(self, handoff: AgentHandoff):
         """Process structured handoff between agents"""
+        self.record_handoff(handoff)
+        
+    def record_handoff(self, handoff: AgentHandoff):
+        """Process a handoff synchronously (it is pure bookkeeping, nothing to await)"""
         # Validate handoff
         if not handoff.from_agent or not handoff.to_agent:
             logger.warning("Invalid handoff: missing agent names")
@@ -73,12 +90,16 @@ class AgentCommunicationProtocol:
         # Update conversation history
         self.conversation_history.append({
             "type": "handoff",
-            "timestamp": handoff.timestamp.isoformat(),
+            "timestamp": datetime.fromtimestamp(handoff.timestamp).isoformat(),
             "from": handoff.from_agent,
             "to": handoff.to_agent,
             "findings_count": len(handoff.key_findings),
             "confidence": handoff.confidence
         })
+        self._handoff_count += 1
+        self._handoff_confidence_sum += handoff.confidence
+        self._agents_involved[handoff.from_agent] = None
+        self._agents_involved[handoff.to_agent] = None
         
     def get_agent_context(self, agent_name: str) -> Optional[AgentHandoff]:
         """Retrieve context for an agent"""
@@ -88,25 +109,26 @@ class AgentCommunicationProtocol:
         """Add an insight from an agent for future reference"""
         if agent_name not in self.agent_insights:
             self.agent_insights[agent_name] = []
+            self._insight_search_text[agent_name] = []
             
-        insight["timestamp"] = datetime.now().isoformat()
+        insight["timestamp"] = time.time()
         self.agent_insights[agent_name].append(insight)
+        self._insight_search_text[agent_name].append(str(insight).lower())
         
         # Keep only recent insights (last 100)
         if len(self.agent_insights[agent_name]) > 100:
             self.agent_insights[agent_name] = self.agent_insights[agent_name][-100:]
+            self._insight_search_text[agent_name] = self._insight_search_text[agent_name][-100:]
             
     def get_agent_insights(self, agent_name: str, topic: str = None) -> List[Dict]:
         """Get insights from an agent, optionally filtered by topic"""
         insights = self.agent_insights.get(agent_name, [])
         
         if topic:
-            # Simple topic filtering
-            filtered = []
-            for insight in insights:
-                if topic.lower() in str(insight).lower():
-                    filtered.append(insight)
-            return filtered
+            # Simple topic filtering against search text prepared at insert time
+            topic = topic.lower()
+            search_text = self._insight_search_text.get(agent_name, [])
+            return [insight for insight, text in zip(insights, search_text) if topic in text]
             
         return insights
         
@@ -154,14 +176,12 @@ class AgentCommunicationProtocol:
         if not self.conversation_history:
             return {"status": "no_conversation"}
             
-        handoffs = [e for e in self.conversation_history if e["type"] == "handoff"]
+        handoff_count = self._handoff_count
         
         return {
-            "total_handoffs": len(handoffs),
-            "agents_involved": list(set(
-                [h["from"] for h in handoffs] + [h["to"] for h in handoffs]
-            )),
-            "average_confidence": sum(h["confidence"] for h in handoffs) / len(handoffs) if handoffs else 0,
+            "total_handoffs": handoff_count,
+            "agents_involved": list(self._agents_involved),
+            "average_confidence": self._handoff_confidence_sum / handoff_count if handoff_count else 0,
             "conversation_length": len(self.conversation_history)
         }
 
@@ -174,60 +194,76 @@ class AgentCoordinator:
         self.agent_dependencies: Dict[str, List[str]] = {}
         self.execution_order: List[str] = []
         
+        # Execution orders keyed by (dependency version, requested agents)
+        self._dependency_version = 0
+        self._order_cache: "OrderedDict[Tuple, List[List[str]]]" = OrderedDict()
+        self._order_cache_size = 128
+        
     def set_dependencies(self, agent_name: str, depends_on: List[str]):
         """Set agent dependencies"""
         self.agent_dependencies[agent_name] = depends_on
+        self._dependency_version += 1
         
     def calculate_execution_order(self, requested_agents: List[str]) -> List[List[str]]:
         """Calculate optimal execution order considering dependencies"""
-        # Build dependency graph
-        graph = {}
-        for agent in requested_agents:
-            graph[agent] = self.agent_dependencies.get(agent, [])
-            
-        # Topological sort to find execution order
-        visited = set()
-        stack = []
+        key = (self._dependency_version, tuple(requested_agents))
         
-        def visit(agent):
-            if agent in visited:
-                return
-            visited.add(agent)
-            for dep in graph.get(agent, []):
-                if dep in requested_agents:
-                    visit(dep)
-            stack.append(agent)
+        levels = self._order_cache.get(key)
+        if levels is None:
+            levels = self._compute_execution_levels(requested_agents)
+            self._order_cache[key] = levels
+            if len(self._order_cache) > self._order_cache_size:
+                self._order_cache.popitem(last=False)
+        else:
+            self._order_cache.move_to_end(key)
             
-        for agent in requested_agents:
-            visit(agent)
-            
-        # Group by levels for parallel execution
+        # Hand out copies so callers can't mutate the cached levels
+        return [list(level) for level in levels]
+        
+    def _compute_execution_levels(self, requested_agents: List[str]) -> List[List[str]]:
+        """Group requested agents into dependency levels using Kahn's algorithm"""
+        agents = list(dict.fromkeys(requested_agents))
+        requested = set(agents)
+        
+        # Build dependency graph restricted to requested agents
+        indegree = {agent: 0 for agent in agents}
+        dependents: Dict[str, List[str]] = {agent: [] for agent in agents}
+        for agent in agents:
+            for dep in self.agent_dependencies.get(agent, []):
+                if dep in requested and dep != agent:
+                    indegree[agent] += 1
+                    dependents[dep].append(agent)
+                    
+        # Kahn's algorithm, grouping by levels for parallel execution
         levels = []
-        positioned = set()
+        ready = [agent for agent in agents if indegree[agent] == 0]
         
-        while stack:
-            level = []
-            for agent in stack[:]:
-                deps = graph.get(agent, [])
-                if all(dep in positioned or dep not in requested_agents for dep in deps):
-                    level.append(agent)
-                    stack.remove(agent)
-                    positioned.add(agent)
-            if level:
-                levels.append(level)
-                
+        while ready:
+            levels.append(ready)
+            next_ready = []
+            for agent in ready:
+                for dependent in dependents[agent]:
+                    indegree[dependent] -= 1
+                    if indegree[dependent] == 0:
+                        next_ready.append(dependent)
+            ready = next_ready
+            
+        # Agents caught in a dependency cycle still run, after everything else
+        remaining = [agent for agent in agents if indegree[agent] > 0]
+        if remaining:
+            logger.warning(f"Dependency cycle detected among: {', '.join(remaining)}")
+            levels.append(remaining)
+            
         return levels
         
     def should_skip_agent(self, agent_name: str) -> bool:
         """Check if an agent should be skipped based on previous results"""
         handoff = self.protocol.get_agent_context(agent_name)
         
-        if handoff and handoff.warnings:
-            # Check for skip signals
-            for warning in handoff.warnings:
-                if "skip" in warning.lower() or "not needed" in warning.lower():
-                    logger.info(f"Skipping {agent_name} based on previous agent recommendation")
-                    return True
+        # Check for skip signals
+        if handoff and handoff.warnings and _SKIP_RE.search("\n".join(handoff.warnings)):
+            logger.info(f"Skipping {agent_name} based on previous agent recommendation")
+            return True
                     
         return False
 
@@ -236,27 +272,40 @@ class MessageBus:
     """Simple message bus for agent events"""
     
     def __init__(self):
-        self.subscribers: Dict[str, List[callable]] = {}
+        # Event type -> list of (is_coroutine_function, handler)
+        self.subscribers: Dict[str, List[Tuple[bool, callable]]] = {}
         
     def subscribe(self, event_type: str, handler: callable):
         """Subscribe to an event type"""
         if event_type not in self.subscribers:
             self.subscribers[event_type] = []
-        self.subscribers[event_type].append(handler)
+        self.subscribers[event_type].append((asyncio.iscoroutinefunction(handler), handler))
         
     async def publish(self, event_type: str, data: Any):
-        """Publish an event"""
-        if event_type in self.subscribers:
-            for handler in self.subscribers[event_type]:
-                try:
-                    if asyncio.iscoroutinefunction(handler):
-                        await handler(data)
-                    else:
-                        handler(data)
-                except Exception as e:
-                    logger.error(f"Error in event handler for {event_type}: {e}")
+        """Publish an event, running async handlers concurrently"""
+        if event_type not in self.subscribers:
+            return
+            
+        coroutines = []
+        for is_coroutine, handler in self.subscribers[event_type]:
+            try:
+                if is_coroutine:
+                    coroutines.append(handler(data))
+                else:
+                    handler(data)
+            except Exception as e:
+                logger.error(f"Error in event handler for {event_type}: {e}")
+                
+        if coroutines:
+            results = await asyncio.gather(*coroutines, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error in event handler for {event_type}: {result}")
                     
     def unsubscribe(self, event_type: str, handler: callable):
         """Unsubscribe from an event type"""
-        if event_type in self.subscribers and handler in self.subscribers[event_type]:
-            self.subscribers[event_type].remove(handler)
\ No newline at end of file
+        subscribers = self.subscribers.get(event_type, [])
+        for i, (_, subscribed) in enumerate(subscribers):
+            if subscribed == handler:
+                del subscribers[i]
+                break
@@ -3,12 +3,82 @@ Dynamic components for adaptive agent behavior
 """
 
 from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, timedelta
 import json
 import hashlib
+import heapq
+import re
+import sys
+import time
+from collections import OrderedDict, Counter, deque
 from dataclasses import dataclass
 from loguru import logger
 import math
+import numpy as np
+
+
+# Phrase substitutions applied by TokenOptimizer.compress_prompt
+_ABBREVIATIONS = {
+    "artificial intelligence": "AI",
+    "machine learning": "ML",
+    "large language model": "LLM",
+    "natural language processing": "NLP",
+    "for example": "e.g.",
+    "that is": "i.e.",
+    "et cetera": "etc.",
+    "versus": "vs.",
+    "approximately": "~",
+    "greater than": ">",
+    "less than": "<",
+    "equal to": "="
+}
+
+_SIMPLIFICATIONS = {
+    "in order to": "to",
+    "due to the fact that": "because",
+    "in the event that": "if",
+    "at this point in time": "now",
+    "for the purpose of": "to",
+    "with regard to": "about",
+    "in accordance with": "per"
+}
+
+# Abbreviations match lower, Title and UPPER case; simplifications only lower case
+_COMPRESSIONS = {
+    variant: abbr
+    for full, abbr in _ABBREVIATIONS.items()
+    for variant in (full, full.title(), full.upper())
+}
+_COMPRESSIONS.update(_SIMPLIFICATIONS)
+
+# Longest phrases first so e.g. "due to the fact that" wins over "that is"
+_COMPRESSION_RE = re.compile(
+    "|".join(re.escape(phrase) for phrase in sorted(_COMPRESSIONS, key=len, reverse=True))
+)
+
+
+# Articles directly before a list item ("the cat, a dog;")
+_ARTICLE_RE = re.compile(r'\b(?:the|a|an)\s+(?=\w+[,;])')
+
+
+# Temperature multipliers per query type
+_QUERY_TEMPERATURE_MULTIPLIERS = {
+    "factual": 0.7,      # More deterministic
+    "analytical": 0.8,   # Somewhat deterministic
+    "creative": 1.3,     # More creative
+    "exploratory": 1.2,  # More exploratory
+    "technical": 0.9     # Balanced
+}
+
+# Retry adjustment saturates at 0.2, i.e. after 4 attempts
+_MAX_ATTEMPT_BUCKET = 4
+_ATTEMPT_BUCKETS = _MAX_ATTEMPT_BUCKET + 1
+
+
+def _unit_vector(embedding: List[float]) -> np.ndarray:
+    """Embedding as a unit-length float32 vector, so a dot product gives cosine similarity"""
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
 
 
 class AdaptiveTemperatureController:
@@ -24,48 +94,36 @@ class AdaptiveTemperatureController:
             "synthesizer": 0.2
         }
         self.performance_history = {}
+        self._temperature_history: Dict[str, deque] = {}
         self.temperature_adjustments = {}
+        self._temp_lut = self._build_temperature_lut()
         
     def get_optimal_temperature(self, agent_name: str, agent_type: str, 
                               query_type: str, previous_attempts: int = 0,
                               performance_metrics: Dict = None) -> float:
         """Calculate optimal temperature for current context"""
         
-        # Get base temperature
-        base_temp = self.base_temperatures.get(agent_type, 0.3)
-        
-        # Adjust based on previous attempts (increase creativity if failing)
         if previous_attempts > 0:
-            attempt_adjustment = min(0.2, 0.05 * previous_attempts)
-            base_temp = min(0.9, base_temp + attempt_adjustment)
             logger.info(f"Increasing temperature for {agent_name} due to {previous_attempts} retries")
             
-        # Adjust based on query type
-        query_adjustments = {
-            "factual": 0.7,      # More deterministic
-            "analytical": 0.8,   # Somewhat deterministic
-            "creative": 1.3,     # More creative
-            "exploratory": 1.2,  # More exploratory
-            "technical": 0.9     # Balanced
-        }
-        
-        query_multiplier = query_adjustments.get(query_type, 1.0)
-        adjusted_temp = base_temp * query_multiplier
-        
-        # Adjust based on recent performance
+        # Bucket recent performance: 0 = struggling, 1 = normal, 2 = excellent
+        success_bucket = 1
         if performance_metrics:
             success_rate = performance_metrics.get("success_rate", 1.0)
             if success_rate < 0.7:
-                # Increase temperature if struggling
-                adjusted_temp = min(0.9, adjusted_temp * 1.2)
+                success_bucket = 0
             elif success_rate > 0.95:
-                # Can afford to be more deterministic
-                adjusted_temp = adjusted_temp * 0.9
+                success_bucket = 2
                 
+        # One probe for the (agent type, query type) row, then tuple indexing by bucket ids
+        row = self._temp_lut.get((agent_type, query_type))
+        if row is None:
+            # Combination outside the precomputed table (e.g. a new agent type)
+            row = self._temp_lut[(agent_type, query_type)] = self._build_temperature_row(agent_type, query_type)
+        adjusted_temp = row[success_bucket * _ATTEMPT_BUCKETS + max(0, min(previous_attempts, _MAX_ATTEMPT_BUCKET))]
+            
         # Apply any manual adjustments
-        if agent_name in self.temperature_adjustments:
-            manual_adjustment = self.temperature_adjustments[agent_name]
-            adjusted_temp = adjusted_temp * manual_adjustment
+        adjusted_temp *= self.temperature_adjustments.get(agent_name, 1.0)
             
         # Ensure within valid range
         final_temp = max(0.0, min(1.0, adjusted_temp))
@@ -75,87 +133,136 @@ class AdaptiveTemperatureController:
         
         return round(final_temp, 2)
         
+    def _build_temperature_lut(self) -> Dict[Tuple[str, str], Tuple[float, ...]]:
+        """Precompute temperature rows for every known agent type and query type"""
+        return {
+            (agent_type, query_type): self._build_temperature_row(agent_type, query_type)
+            for agent_type in self.base_temperatures
+            for query_type in _QUERY_TEMPERATURE_MULTIPLIERS
+        }
+        
+    def _build_temperature_row(self, agent_type: str, query_type: str) -> Tuple[float, ...]:
+        """Temperatures for one agent/query type, indexed by success_bucket * _ATTEMPT_BUCKETS + attempts"""
+        return tuple(
+            self._compute_temperature(agent_type, query_type, success_bucket, attempts)
+            for success_bucket in range(3)
+            for attempts in range(_ATTEMPT_BUCKETS)
+        )
+        
+    def _compute_temperature(self, agent_type: str, query_type: str, 
+                             success_bucket: int, previous_attempts: int) -> float:
+        """Temperature before manual adjustment and clipping"""
+        
+        # Get base temperature
+        base_temp = self.base_temperatures.get(agent_type, 0.3)
+        
+        # Adjust based on previous attempts (increase creativity if failing)
+        if previous_attempts > 0:
+            attempt_adjustment = min(0.2, 0.05 * previous_attempts)
+            base_temp = min(0.9, base_temp + attempt_adjustment)
+            
+        # Adjust based on query type
+        adjusted_temp = base_temp * _QUERY_TEMPERATURE_MULTIPLIERS.get(query_type, 1.0)
+        
+        # Adjust based on recent performance
+        if success_bucket == 0:
+            # Increase temperature if struggling
+            adjusted_temp = min(0.9, adjusted_temp * 1.2)
+        elif success_bucket == 2:
+            # Can afford to be more deterministic
+            adjusted_temp = adjusted_temp * 0.9
+            
+        return adjusted_temp
+        
     def _record_temperature_usage(self, agent_name: str, temperature: float, query_type: str):
         """Record temperature usage for optimization"""
-        if agent_name not in self.performance_history:
-            self.performance_history[agent_name] = []
+        history = self.performance_history.get(agent_name)
+        if history is None:
+            # Ring buffers keep only the 100 most recent usages; temperatures are held
+            # separately so analytics can reduce over plain floats
+            agent_name = sys.intern(agent_name)
+            history = self.performance_history[agent_name] = deque(maxlen=100)
+            self._temperature_history[agent_name] = deque(maxlen=100)
             
-        self.performance_history[agent_name].append({
-            "timestamp": datetime.now().isoformat(),
-            "temperature": temperature,
-            "query_type": query_type
-        })
-        
-        # Keep only recent history
-        if len(self.performance_history[agent_name]) > 100:
-            self.performance_history[agent_name] = self.performance_history[agent_name][-100:]
+        # (monotonic_ns, query_type)
+        history.append((time.monotonic_ns(), query_type))
+        self._temperature_history[agent_name].append(temperature)
             
     def set_manual_adjustment(self, agent_name: str, multiplier: float):
         """Set manual temperature adjustment for an agent"""
-        self.temperature_adjustments[agent_name] = max(0.5, min(1.5, multiplier))
+        self.temperature_adjustments[sys.intern(agent_name)] = max(0.5, min(1.5, multiplier))
         
     def get_temperature_analytics(self, agent_name: str) -> Dict[str, Any]:
         """Get temperature usage analytics"""
-        history = self.performance_history.get(agent_name, [])
+        temps = self._temperature_history.get(agent_name)
         
-        if not history:
+        if not temps:
             return {"status": "no_data"}
             
-        temps = [h["temperature"] for h in history]
-        
         return {
             "average_temperature": sum(temps) / len(temps),
             "min_temperature": min(temps),
             "max_temperature": max(temps),
-            "total_adjustments": len(history),
+            "total_adjustments": len(temps),
             "recent_trend": "increasing" if len(temps) > 1 and temps[-1] > temps[-2] else "stable"
         }
 
 
+# Context keys DynamicPromptBuilder.build_prompt knows how to apply
+_PROMPT_CONTEXT_KEYS = frozenset({
+    "previous_errors",
+    "performance_hints",
+    "user_expertise",
+    "time_constraint",
+    "format_preference"
+})
+
+
 class DynamicPromptBuilder:
     """Build prompts dynamically based on context"""
     
     def __init__(self):
         self.prompt_templates = {}
         self.context_modifiers = {}
-        self.success_patterns = {}
+        self.success_patterns = {}  # Agent -> min-heap of (success_count, -seq, pattern)
+        self._pattern_seq = 0
         
     def build_prompt(self, agent_name: str, agent_type: str, 
                     base_prompt: str, context: Dict[str, Any]) -> str:
         """Build enhanced prompt based on context"""
         
-        enhanced_prompt = base_prompt
+        parts = [base_prompt]
         
-        # Add previous errors context
-        if context.get("previous_errors"):
-            error_context = self._build_error_context(context["previous_errors"])
-            enhanced_prompt = f"{error_context}\n\n{enhanced_prompt}"
-            
-        # Add performance hints
-        if context.get("performance_hints"):
-            hints = "\n".join(f"- {hint}" for hint in context["performance_hints"])
-            enhanced_prompt += f"\n\nPerformance hints:\n{hints}"
-            
-        # Add user expertise level adjustments
-        if context.get("user_expertise"):
-            expertise_modifier = self._get_expertise_modifier(context["user_expertise"])
-            enhanced_prompt += f"\n\n{expertise_modifier}"
-            
-        # Add time constraints
-        if context.get("time_constraint"):
-            enhanced_prompt += f"\n\nTime constraint: Provide a {context['time_constraint']} response."
-            
-        # Add format preferences
-        if context.get("format_preference"):
-            enhanced_prompt += f"\n\nFormat preference: {context['format_preference']}"
+        # Only the context keys this builder understands need checking
+        present = context.keys() & _PROMPT_CONTEXT_KEYS if context else ()
+        
+        if present:
+            # Add previous errors context
+            if "previous_errors" in present and context["previous_errors"]:
+                parts.insert(0, self._build_error_context(context["previous_errors"]))
+                
+            # Add performance hints
+            if "performance_hints" in present and context["performance_hints"]:
+                hints = "\n".join(f"- {hint}" for hint in context["performance_hints"])
+                parts.append(f"Performance hints:\n{hints}")
+                
+            # Add user expertise level adjustments
+            if "user_expertise" in present and context["user_expertise"]:
+                parts.append(self._get_expertise_modifier(context["user_expertise"]))
+                
+            # Add time constraints
+            if "time_constraint" in present and context["time_constraint"]:
+                parts.append(f"Time constraint: Provide a {context['time_constraint']} response.")
+                
+            # Add format preferences
+            if "format_preference" in present and context["format_preference"]:
+                parts.append(f"Format preference: {context['format_preference']}")
             
         # Add successful pattern hints
         if agent_name in self.success_patterns:
-            pattern_hint = self._get_pattern_hint(agent_name)
-            if pattern_hint:
-                enhanced_prompt += f"\n\n{pattern_hint}"
+            parts.append(self._get_pattern_hint(agent_name))
                 
-        return enhanced_prompt
+        return "\n\n".join(p for p in parts if p)
         
     def _build_error_context(self, errors: List[str]) -> str:
         """Build context from previous errors"""
@@ -183,8 +290,8 @@ class DynamicPromptBuilder:
         if not patterns:
             return None
             
-        # Use most successful pattern
-        best_pattern = max(patterns, key=lambda p: p.get("success_count", 0))
+        # Use most successful pattern (earliest registered on ties)
+        _, _, best_pattern = max(patterns, key=lambda item: (item[0], item[1]))
         
         if best_pattern.get("hint"):
             return f"Hint: {best_pattern['hint']}"
@@ -193,18 +300,19 @@ class DynamicPromptBuilder:
         
     def register_success_pattern(self, agent_name: str, pattern: Dict[str, Any]):
         """Register a successful pattern for future use"""
-        if agent_name not in self.success_patterns:
-            self.success_patterns[agent_name] = []
+        heap = self.success_patterns.get(agent_name)
+        if heap is None:
+            heap = self.success_patterns[sys.intern(agent_name)] = []
             
-        self.success_patterns[agent_name].append(pattern)
+        # Negated sequence number breaks ties so the newest equal-count pattern is dropped first
+        self._pattern_seq += 1
+        item = (pattern.get("success_count", 0), -self._pattern_seq, pattern)
         
         # Keep only top 10 patterns
-        if len(self.success_patterns[agent_name]) > 10:
-            self.success_patterns[agent_name].sort(
-                key=lambda p: p.get("success_count", 0), 
-                reverse=True
-            )
-            self.success_patterns[agent_name] = self.success_patterns[agent_name][:10]
+        if len(heap) < 10:
+            heapq.heappush(heap, item)
+        else:
+            heapq.heappushpop(heap, item)
 
 
 class TokenOptimizer:
@@ -214,53 +322,20 @@ class TokenOptimizer:
     def compress_prompt(prompt: str, target_reduction: float = 0.2) -> str:
         """Compress prompt while maintaining clarity"""
         
-        original_length = len(prompt.split())
-        
-        # Step 1: Remove redundant whitespace
-        compressed = " ".join(prompt.split())
-        
-        # Step 2: Apply common abbreviations
-        abbreviations = {
-            "artificial intelligence": "AI",
-            "machine learning": "ML",
-            "large language model": "LLM",
-            "natural language processing": "NLP",
-            "for example": "e.g.",
-            "that is": "i.e.",
-            "et cetera": "etc.",
-            "versus": "vs.",
-            "approximately": "~",
-            "greater than": ">",
-            "less than": "<",
-            "equal to": "="
-        }
-        
-        for full, abbr in abbreviations.items():
-            compressed = compressed.replace(full, abbr)
-            compressed = compressed.replace(full.title(), abbr)
-            compressed = compressed.replace(full.upper(), abbr)
-            
-        # Step 3: Simplify verbose phrases
-        simplifications = {
-            "in order to": "to",
-            "due to the fact that": "because",
-            "in the event that": "if",
-            "at this point in time": "now",
-            "for the purpose of": "to",
-            "with regard to": "about",
-            "in accordance with": "per"
-        }
+        # Step 1: Remove redundant whitespace (tokenizing once)
+        words = prompt.split()
+        original_length = len(words)
+        compressed = " ".join(words)
         
-        for verbose, simple in simplifications.items():
-            compressed = compressed.replace(verbose, simple)
+        # Steps 2-3: Apply common abbreviations and simplify verbose phrases in one pass
+        compressed = _COMPRESSION_RE.sub(lambda m: _COMPRESSIONS[m.group(0)], compressed)
             
         # Step 4: Remove unnecessary articles in lists
-        import re
-        compressed = re.sub(r'\b(the|a|an)\s+(?=\w+[,;])', '', compressed)
+        compressed = _ARTICLE_RE.sub('', compressed)
         
-        # Check if we achieved target reduction
-        new_length = len(compressed.split())
-        reduction = 1 - (new_length / original_length)
+        # Check if we achieved target reduction; words are single-space separated by now
+        new_length = compressed.count(" ") + 1 if compressed else 0
+        reduction = 1 - (new_length / original_length) if original_length else 0.0
         
         logger.debug(f"Token optimization: {original_length} -> {new_length} tokens ({reduction:.1%} reduction)")
         
@@ -269,11 +344,15 @@ class TokenOptimizer:
     @staticmethod
     def estimate_tokens(text: str) -> int:
         """Estimate token count (rough approximation)"""
+        return TokenOptimizer._tokens_for_words(len(text.split()), "```" in text)
+        
+    @staticmethod
+    def _tokens_for_words(word_count: int, has_code: bool) -> int:
+        """Estimate tokens from a word count"""
         # Rough estimation: ~1.3 tokens per word for English
-        word_count = len(text.split())
         
         # Adjust for code blocks and special content
-        if "```" in text:
+        if has_code:
             # Code typically has more tokens per "word"
             return int(word_count * 1.5)
         else:
@@ -284,31 +363,33 @@ class TokenOptimizer:
                                 overlap: int = 200) -> List[str]:
         """Split text to fit in context window with overlap"""
         
-        estimated_tokens = TokenOptimizer.estimate_tokens(text)
+        # Split by paragraphs first, tokenizing each paragraph once
+        paragraphs = text.split('\n\n')
+        word_counts = [len(para.split()) for para in paragraphs]
         
-        if estimated_tokens <= max_tokens:
+        # Paragraph breaks are whitespace, so the counts add up to the whole text's
+        if TokenOptimizer._tokens_for_words(sum(word_counts), "```" in text) <= max_tokens:
             return [text]
             
-        # Split by paragraphs first
-        paragraphs = text.split('\n\n')
-        
         chunks = []
         current_chunk = []
         current_tokens = 0
+        last_para_tokens = 0
         
-        for para in paragraphs:
-            para_tokens = TokenOptimizer.estimate_tokens(para)
+        for para, word_count in zip(paragraphs, word_counts):
+            para_tokens = TokenOptimizer._tokens_for_words(word_count, "```" in para)
             
             if current_tokens + para_tokens > max_tokens - overlap:
                 # Start new chunk
                 if current_chunk:
                     chunks.append('\n\n'.join(current_chunk))
                     # Keep last paragraph for overlap
-                    current_chunk = [current_chunk[-1]] if len(current_chunk) > 0 else []
-                    current_tokens = TokenOptimizer.estimate_tokens(current_chunk[0]) if current_chunk else 0
+                    current_chunk = [current_chunk[-1]]
+                    current_tokens = last_para_tokens
                     
             current_chunk.append(para)
             current_tokens += para_tokens
+            last_para_tokens = para_tokens
             
         if current_chunk:
             chunks.append('\n\n'.join(current_chunk))
@@ -320,57 +401,141 @@ class PromptCache:
     """Cache successful prompts for reuse"""
     
     def __init__(self, max_size: int = 1000):
-        self.cache = {}
-        self.access_counts = {}
+        self.cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()  # Least recently used first
+        self.access_counts = Counter()  # Analytics only
         self.success_rates = {}
+        self.hits = 0
+        self.misses = 0
         self.max_size = max_size
+        self._agent_keys: Dict[str, Dict[Tuple[str, str], None]] = {}  # Agent -> ordered cached keys
+        self._vocab: Dict[str, int] = {}  # Token -> bit position in query bitsets
+        self._token_refs: Counter = Counter()  # Token -> cached entries using it
+        self._free_bits: List[int] = []  # Positions released by evicted tokens, reused first
         
-    def _generate_key(self, agent_name: str, query: str) -> str:
-        """Generate cache key"""
-        content = f"{agent_name}:{query.lower().strip()}"
-        return hashlib.md5(content.encode()).hexdigest()
+    def _generate_key(self, agent_name: str, query: str) -> Tuple[str, str]:
+        """Generate cache key (the cache is in-memory only, so no digest is needed)"""
+        return (agent_name, query.lower().strip())
         
     def get(self, agent_name: str, query: str, similarity_threshold: float = 0.9) -> Optional[str]:
         """Get cached prompt if available"""
+        key = self._find(agent_name, query, similarity_threshold)
+        return self.cache[key]["prompt"] if key else None
+        
+    def get_result(self, agent_name: str, query: str, query_embedding: Optional[List[float]] = None,
+                   similarity_threshold: float = 0.9, embedding_threshold: float = 0.95) -> Optional[Dict[str, Any]]:
+        """Get the cached result (e.g. a parsed analysis) stored for the same or a similar query"""
+        key = self._find(agent_name, query, similarity_threshold, "result",
+                         query_embedding, embedding_threshold)
+        # A copy, so callers can't alter what later hits receive
+        return dict(self.cache[key]["result"]) if key else None
+        
+    def _find(self, agent_name: str, query: str, similarity_threshold: float, 
+              field: str = "prompt", query_embedding: Optional[List[float]] = None,
+              embedding_threshold: float = 0.95) -> Optional[Tuple[str, str]]:
+        """Key of the best cached entry holding field: exact, then by embedding, then by words"""
         
         # Try exact match first
         key = self._generate_key(agent_name, query)
         
-        if key in self.cache:
-            self.access_counts[key] = self.access_counts.get(key, 0) + 1
-            logger.debug(f"Cache hit for {agent_name}")
-            return self.cache[key]["prompt"]
+        if self.cache.get(key, {}).get(field) is not None:
+            return self._hit(key, f"Cache hit for {agent_name}")
+            
+        # Paraphrases: cosine similarity against entries stored with an embedding
+        if query_embedding is not None:
+            query_vec = _unit_vector(query_embedding)
+            best_match = None
+            best_score = embedding_threshold
             
-        # Try similar matches
-        query_words = set(query.lower().split())
+            for cached_key in self._agent_keys.get(agent_name, ()):
+                entry = self.cache[cached_key]
+                cached_vec = entry.get("embedding")
+                if cached_vec is None or cached_vec.shape != query_vec.shape or entry.get(field) is None:
+                    continue
+                similarity = float(cached_vec @ query_vec)
+                if similarity >= best_score:
+                    best_score = similarity
+                    best_match = cached_key
+                    
+            if best_match:
+                return self._hit(best_match, f"Embedding cache hit for {agent_name} (similarity: {best_score:.2f})")
+            
+        # Try similar matches among this agent's entries, using bitsets built at store time.
+        # Tokens never stored can't intersect, so they only count towards the query size.
+        query_words = frozenset(key[1].split())
+        query_size = len(query_words)
+        query_bits = self._to_bits(query_words)
         best_match = None
         best_score = 0
         
-        for cached_key, cached_data in self.cache.items():
-            if cached_data["agent_name"] != agent_name:
+        for cached_key in self._agent_keys.get(agent_name, ()):
+            entry = self.cache[cached_key]
+            cached_size = entry["query_size"]
+            
+            # Jaccard similarity can't exceed the ratio of the set sizes
+            if min(query_size, cached_size) < similarity_threshold * max(query_size, cached_size):
+                continue
+            if entry.get(field) is None:
                 continue
                 
-            cached_words = set(cached_data["query"].lower().split())
-            
-            # Jaccard similarity
-            intersection = len(query_words & cached_words)
-            union = len(query_words | cached_words)
+            # Jaccard similarity via popcount of the shared bits
+            intersection = (query_bits & entry["query_bits"]).bit_count()
+            union = query_size + cached_size - intersection
             similarity = intersection / union if union > 0 else 0
             
             if similarity >= similarity_threshold and similarity > best_score:
                 best_score = similarity
                 best_match = cached_key
                 
+                # Same token set (e.g. different spacing); nothing can score higher
+                if similarity == 1.0:
+                    break
+                
         if best_match:
-            self.access_counts[best_match] = self.access_counts.get(best_match, 0) + 1
-            logger.debug(f"Similar cache hit for {agent_name} (similarity: {best_score:.2f})")
-            return self.cache[best_match]["prompt"]
+            return self._hit(best_match, f"Similar cache hit for {agent_name} (similarity: {best_score:.2f})")
             
+        self.misses += 1
         return None
         
+    def _hit(self, key: Tuple[str, str], message: str) -> Tuple[str, str]:
+        """Record a cache hit on key"""
+        self.cache.move_to_end(key)
+        self.access_counts[key] += 1
+        self.hits += 1
+        logger.debug(message)
+        return key
+        
+    def _to_bits(self, tokens) -> int:
+        """Encode tokens as an int bitset over the cache vocabulary"""
+        vocab = self._vocab
+        bits = 0
+        for token in tokens:
+            position = vocab.get(token)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+        
+    def _acquire_bits(self, tokens) -> int:
+        """Encode a cached entry's tokens, adding new ones to the vocabulary"""
+        vocab = self._vocab
+        for token in tokens:
+            if token not in vocab:
+                # Recycled positions keep bitsets as wide as the live vocabulary, not all traffic
+                vocab[token] = self._free_bits.pop() if self._free_bits else len(vocab)
+            self._token_refs[token] += 1
+        return self._to_bits(tokens)
+        
+    def _release_bits(self, tokens):
+        """Drop an evicted entry's tokens, freeing positions no cached entry uses"""
+        for token in tokens:
+            self._token_refs[token] -= 1
+            if not self._token_refs[token]:
+                del self._token_refs[token]
+                self._free_bits.append(self._vocab.pop(token))
+        
     def store(self, agent_name: str, query: str, prompt: str, 
-             success: bool = True, response_quality: float = 1.0):
-        """Store prompt in cache"""
+             success: bool = True, response_quality: float = 1.0,
+             result: Optional[Dict[str, Any]] = None, query_embedding: Optional[List[float]] = None):
+        """Store prompt in cache, optionally with its parsed result and the query embedding"""
         
         key = self._generate_key(agent_name, query)
         
@@ -392,52 +557,96 @@ class PromptCache:
         avg_quality = self.success_rates[key]["quality_sum"] / self.success_rates[key]["count"]
         
         if success_rate >= 0.8 and avg_quality >= 0.8:
+            query_tokens = frozenset(key[1].split())
+            # A replaced entry has the same tokens and keeps its references
+            cached = self.cache.get(key)
+            query_bits = cached["query_bits"] if cached else self._acquire_bits(query_tokens)
             self.cache[key] = {
                 "agent_name": agent_name,
                 "query": query,
+                "query_bits": query_bits,
+                "query_size": len(query_tokens),
                 "prompt": prompt,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": time.monotonic_ns(),
                 "success_rate": success_rate,
-                "quality": avg_quality
+                "quality": avg_quality,
+                "result": result,
+                "embedding": _unit_vector(query_embedding) if query_embedding is not None else None
             }
             
-            # Evict least accessed if over limit
-            if len(self.cache) > self.max_size:
-                self._evict_least_accessed()
+            self.cache.move_to_end(key)
+            self._agent_keys.setdefault(agent_name, {})[key] = None
+            
+            # Evict least recently used entries if over limit
+            while len(self.cache) > self.max_size:
+                evicted, _ = self.cache.popitem(last=False)
+                self._agent_keys[evicted[0]].pop(evicted, None)
+                self._release_bits(frozenset(evicted[1].split()))
+                self.access_counts.pop(evicted, None)
+                self.success_rates.pop(evicted, None)
                 
             logger.debug(f"Cached prompt for {agent_name}")
             
-    def _evict_least_accessed(self):
-        """Remove least accessed cache entries"""
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
         
-        # Sort by access count
-        sorted_keys = sorted(
-            self.cache.keys(), 
-            key=lambda k: self.access_counts.get(k, 0)
-        )
+        lookups = self.hits + self.misses
+        
+        return {
+            "cache_size": len(self.cache),
+            "total_accesses": self.hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "most_accessed": self.access_counts.most_common(5)
+        }
+
+
+class ResponseCache:
+    """LRU cache of generated responses keyed by the exact generation request"""
+    
+    def __init__(self, max_size: int = 256):
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
         
-        # Remove bottom 10%
-        remove_count = max(1, int(self.max_size * 0.1))
+    def _generate_key(self, model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        """Generate cache key"""
+        content = f"{model}|{temperature}|{max_tokens}|{prompt}"
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
         
-        for key in sorted_keys[:remove_count]:
-            del self.cache[key]
-            if key in self.access_counts:
-                del self.access_counts[key]
-            if key in self.success_rates:
-                del self.success_rates[key]
-                
+    def get(self, model: str, temperature: float, max_tokens: int, prompt: str) -> Optional[str]:
+        """Get cached response for an identical request"""
+        key = self._generate_key(model, temperature, max_tokens, prompt)
+        
+        response = self.cache.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+            
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return response
+        
+    def store(self, model: str, temperature: float, max_tokens: int, prompt: str, response: str):
+        """Store a generated response"""
+        key = self._generate_key(model, temperature, max_tokens, prompt)
+        
+        self.cache[key] = response
+        self.cache.move_to_end(key)
+        
+        # Evict least recently used if over limit
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+            
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        
-        total_accesses = sum(self.access_counts.values())
+        lookups = self.hits + self.misses
         
         return {
             "cache_size": len(self.cache),
-            "total_accesses": total_accesses,
-            "hit_rate": total_accesses / max(1, total_accesses + len(self.cache)),
-            "most_accessed": sorted(
-                self.access_counts.items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:5]
-        }
\ No newline at end of file
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
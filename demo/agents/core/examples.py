@@ -2,9 +2,41 @@
 Few-shot examples for consistent agent outputs
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+from collections import OrderedDict
 from dataclasses import dataclass
+import heapq
 import json
+import re
+
+
+# Formatted example bodies keyed by (id(example), example_type). The example
+# itself is kept in the value so its id cannot be reused while cached.
+_FORMATTED_EXAMPLES: "OrderedDict[Tuple[int, str], Tuple[Dict[str, Any], str]]" = OrderedDict()
+_FORMATTED_EXAMPLES_MAX = 256
+
+
+def _format_example_body(example: Dict[str, Any], example_type: str) -> str:
+    """Format one example (without its number), serializing each example only once"""
+    key = (id(example), example_type)
+    cached = _FORMATTED_EXAMPLES.get(key)
+    if cached is not None and cached[0] is example:
+        _FORMATTED_EXAMPLES.move_to_end(key)
+        return cached[1]
+        
+    if example_type == "analysis":
+        body = f"Query: {example['query']}\nAnalysis: {json.dumps(example['response'], indent=2)}"
+    else:
+        lines = [f"Query: {example['query']}"]
+        if 'domain' in example:
+            lines.append(f"Domain: {example['domain']}")
+        lines.append(f"Response:\n{example['response']}")
+        body = '\n'.join(lines)
+        
+    _FORMATTED_EXAMPLES[key] = (example, body)
+    if len(_FORMATTED_EXAMPLES) > _FORMATTED_EXAMPLES_MAX:
+        _FORMATTED_EXAMPLES.popitem(last=False)
+    return body
 
 
 @dataclass
@@ -140,21 +172,15 @@ AI safety is progressing from theoretical concerns to practical implementations,
     def format_examples_for_prompt(examples: List[Dict[str, Any]], 
                                   example_type: str = "analysis") -> str:
         """Format examples for inclusion in prompts"""
+        if example_type not in ("analysis", "response"):
+            return ""
+            
         formatted = []
         
         for i, example in enumerate(examples, 1):
-            if example_type == "analysis":
-                formatted.append(f"Example {i}:")
-                formatted.append(f"Query: {example['query']}")
-                formatted.append(f"Analysis: {json.dumps(example['response'], indent=2)}")
-                formatted.append("")
-            elif example_type == "response":
-                formatted.append(f"Example {i}:")
-                formatted.append(f"Query: {example['query']}")
-                if 'domain' in example:
-                    formatted.append(f"Domain: {example['domain']}")
-                formatted.append(f"Response:\n{example['response']}")
-                formatted.append("")
+            formatted.append(f"Example {i}:")
+            formatted.append(_format_example_body(example, example_type))
+            formatted.append("")
                 
         return '\n'.join(formatted)
 
@@ -168,6 +194,11 @@ class ExampleSelector:
             "domain": AgentExamples.get_domain_specialist_examples(),
             "synthesis": AgentExamples.get_synthesis_examples()
         }
+        # Example query tokens, parallel to examples_cache, tokenized once
+        self._example_tokens = {
+            agent_type: [frozenset(example['query'].lower().split()) for example in examples]
+            for agent_type, examples in self.examples_cache.items()
+        }
         
     def get_relevant_examples(self, query: str, agent_type: str, 
                             max_examples: int = 2) -> List[Dict[str, Any]]:
@@ -177,20 +208,14 @@ class ExampleSelector:
         if not all_examples:
             return []
             
-        # Simple relevance scoring based on keyword overlap
-        scored_examples = []
-        query_words = set(query.lower().split())
+        # Simple relevance scoring based on keyword overlap (the query length
+        # normalisation is the same for every example, so raw overlap ranks identically)
+        query_words = frozenset(query.lower().split())
+        scores = [len(query_words & tokens) for tokens in self._example_tokens[agent_type]]
         
-        for example in all_examples:
-            example_words = set(example['query'].lower().split())
-            # Score based on word overlap
-            overlap = len(query_words & example_words)
-            score = overlap / max(len(query_words), 1)
-            scored_examples.append((score, example))
-            
-        # Sort by score and return top examples
-        scored_examples.sort(key=lambda x: x[0], reverse=True)
-        return [ex[1] for ex in scored_examples[:max_examples]]
+        # Partial selection of the top examples; ties keep their original order
+        top = heapq.nlargest(max_examples, range(len(scores)), key=scores.__getitem__)
+        return [all_examples[i] for i in top]
     
     def get_complexity_matched_examples(self, complexity: str, 
                                       agent_type: str) -> List[Dict[str, Any]]:
@@ -208,6 +233,10 @@ class ExampleSelector:
 class PromptExampleBuilder:
     """Build example sections for prompts"""
     
+    # Complexity indicators, matched as substrings like the keyword lists they replace
+    _SIMPLE_RE = re.compile(r"what is|define|how to|explain")
+    _COMPLEX_RE = re.compile(r"compare|analyze|evaluate|impact|versus|lifecycle|comprehensive|detailed")
+    
     def __init__(self):
         self.selector = ExampleSelector()
         
@@ -227,10 +256,10 @@ class PromptExampleBuilder:
             complexity_matched = self.selector.get_complexity_matched_examples(
                 complexity, agent_type
             )
-            # Add only if not already included
-            for ex in complexity_matched:
-                if ex not in examples:
-                    examples.append(ex)
+            # Add only if not already included; both lists share the selector's
+            # example dicts, so identity is enough
+            seen = {id(ex) for ex in examples}
+            examples.extend(ex for ex in complexity_matched if id(ex) not in seen)
                     
         # Format examples
         if examples:
@@ -243,16 +272,12 @@ class PromptExampleBuilder:
         """Simple heuristic to estimate query complexity"""
         word_count = len(query.split())
         
-        # Check for complexity indicators
-        complex_keywords = ["compare", "analyze", "evaluate", "impact", "versus", 
-                          "lifecycle", "comprehensive", "detailed"]
-        simple_keywords = ["what is", "define", "how to", "explain"]
-        
         query_lower = query.lower()
         
-        if any(keyword in query_lower for keyword in simple_keywords):
+        # Check for complexity indicators
+        if self._SIMPLE_RE.search(query_lower):
             return "simple"
-        elif any(keyword in query_lower for keyword in complex_keywords) or word_count > 20:
+        elif self._COMPLEX_RE.search(query_lower) or word_count > 20:
             return "complex"
         else:
             return "moderate"
\ No newline at end of file
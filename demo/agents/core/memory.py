@@ -2,19 +2,164 @@
 Long-term memory system for agent learning and improvement
 """
 
-import sqlite3
+import io
 import json
 import os
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple, Iterable, BinaryIO
+from collections import defaultdict, deque
 from datetime import datetime, timedelta
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 import hashlib
 from pathlib import Path
 from loguru import logger
 import numpy as np
+import orjson
 
+try:
+    # Newer SQLite builds (faster FTS5, mmap I/O) than many bundled stdlib versions
+    from pysqlite3 import dbapi2 as sqlite3
+except ImportError:
+    import sqlite3
 
-@dataclass
+try:
+    import hnswlib
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+
+# Columns read back into a MemoryEntry (leaves out created_at and query_sig)
+_MEMORY_ENTRY_COLUMNS = (
+    "id, agent_name, query, response, prompt, metadata, "
+    "timestamp, success, execution_time, tokens_used, embedding"
+)
+
+_INSERT_MEMORY_SQL = '''
+    INSERT OR REPLACE INTO memories 
+    (id, agent_name, query, response, prompt, metadata, 
+     timestamp, success, execution_time, tokens_used, embedding, query_sig)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Agent totals plus the trend over its last 10 memories, in one round trip.
+# Always returns one row; the agent_metrics columns are NULL for unknown agents.
+_AGENT_METRICS_SQL = '''
+    WITH recent AS (
+        SELECT success, execution_time FROM memories 
+        WHERE agent_name = ? 
+        ORDER BY timestamp DESC 
+        LIMIT 10
+    )
+    SELECT m.total_queries, m.successful_queries, m.total_time, m.total_tokens,
+           (SELECT COUNT(*) FROM recent) AS recent_count,
+           (SELECT AVG(success) FROM recent) AS recent_success_rate,
+           (SELECT AVG(execution_time) FROM recent) AS recent_avg_time
+    FROM (SELECT 1) LEFT JOIN agent_metrics m ON m.agent_name = ?
+'''
+
+# Query keyword signatures: each keyword sets one of _SIG_BITS bits (by CRC32)
+_SIG_BITS = 512
+_SIG_BYTES = _SIG_BITS // 8
+
+# Adds per-agent deltas to the running totals in one statement
+_UPSERT_METRICS_SQL = '''
+    INSERT INTO agent_metrics 
+    (agent_name, total_queries, successful_queries, total_time, total_tokens)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(agent_name) DO UPDATE SET
+        total_queries = total_queries + excluded.total_queries,
+        successful_queries = successful_queries + excluded.successful_queries,
+        total_time = total_time + excluded.total_time,
+        total_tokens = total_tokens + excluded.total_tokens,
+        last_updated = excluded.last_updated
+'''
+
+# Metric deltas are kept in memory and flushed after this many writes or seconds
+_METRICS_FLUSH_WRITES = 50
+_METRICS_FLUSH_SECONDS = 30.0
+
+# Full-text index over memory queries, kept in sync with the memories table
+_FTS_SCHEMA = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+        query, content='memories', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+        INSERT INTO memories_fts(rowid, query) VALUES (new.rowid, new.query);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+        INSERT INTO memories_fts(memories_fts, rowid, query) VALUES ('delete', old.rowid, old.query);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS memories_au AFTER UPDATE ON memories BEGIN
+        INSERT INTO memories_fts(memories_fts, rowid, query) VALUES ('delete', old.rowid, old.query);
+        INSERT INTO memories_fts(rowid, query) VALUES (new.rowid, new.query);
+    END
+    '''
+)
+
+
+@lru_cache(maxsize=4096)
+def _query_tokens(text: str) -> frozenset:
+    """Lower-cased keyword set of a query, cached since the same queries recur"""
+    return frozenset(text.lower().split())
+
+
+def _fts_match_expression(keywords) -> str:
+    """Build an FTS5 MATCH expression that matches any of the keywords"""
+    return " OR ".join('"' + keyword.replace('"', '""') + '"' for keyword in keywords)
+
+
+def _query_signature(keywords) -> bytes:
+    """Hashed keyword bitset of a query, as little-endian bytes"""
+    bits = 0
+    for keyword in keywords:
+        bits |= 1 << (zlib.crc32(keyword.encode()) % _SIG_BITS)
+    return bits.to_bytes(_SIG_BYTES, "little")
+
+
+def _sql_query_signature(query: str) -> bytes:
+    """SQL function query_signature(query), used to backfill older rows"""
+    return _query_signature(_query_tokens(query))
+
+
+def _sql_signature_similarity(sig: Optional[bytes], query_sig: bytes) -> float:
+    """SQL function signature_similarity(a, b): approximate Jaccard of two signatures"""
+    if sig is None:
+        return 0.0
+    a = int.from_bytes(sig, "little")
+    b = int.from_bytes(query_sig, "little")
+    union = (a | b).bit_count()
+    return (a & b).bit_count() / union if union else 0.0
+
+
+def _embedding_to_blob(embedding) -> Optional[bytes]:
+    """Serialize an embedding as raw float32 bytes"""
+    if embedding is None or len(embedding) == 0:
+        return None
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def _blob_to_embedding(value) -> Optional[List[float]]:
+    """Deserialize an embedding stored as float32 bytes (or legacy JSON text)"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        return orjson.loads(value)
+    return np.frombuffer(value, dtype=np.float32).tolist()
+
+
+@dataclass(slots=True)
 class MemoryEntry:
     """Single memory entry"""
     id: str = ""
@@ -33,7 +178,52 @@ class MemoryEntry:
         if not self.id:
             # Generate unique ID based on content
             content = f"{self.agent_name}:{self.query}:{self.timestamp.isoformat()}"
-            self.id = hashlib.md5(content.encode()).hexdigest()
+            self.id = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+@dataclass(slots=True)
+class _VecMatrix:
+    """Unit-normalized embeddings of one dimension in parallel arrays, for exact scans"""
+    vectors: np.ndarray  # float32 [capacity, dim]; the first `count` rows are in use
+    rowids: np.ndarray   # int64 [capacity]
+    agents: np.ndarray   # object [capacity], agent name per row
+    count: int = 0
+    synced_rowid: int = 0  # Last memories rowid added
+    
+    @classmethod
+    def empty(cls, dim: int, capacity: int = 256) -> "_VecMatrix":
+        return cls(
+            vectors=np.zeros((capacity, dim), dtype=np.float32),
+            rowids=np.zeros(capacity, dtype=np.int64),
+            agents=np.empty(capacity, dtype=object)
+        )
+        
+    def extend(self, rows: List[sqlite3.Row]):
+        """Append (rowid, agent_name, embedding) rows, doubling capacity as needed"""
+        dim = self.vectors.shape[1]
+        needed = self.count + len(rows)
+        if needed > len(self.rowids):
+            capacity = max(needed, 2 * len(self.rowids))
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+            vectors[:self.count] = self.vectors[:self.count]
+            rowids = np.zeros(capacity, dtype=np.int64)
+            rowids[:self.count] = self.rowids[:self.count]
+            agents = np.empty(capacity, dtype=object)
+            agents[:self.count] = self.agents[:self.count]
+            self.vectors, self.rowids, self.agents = vectors, rowids, agents
+            
+        added = np.frombuffer(
+            b"".join(row["embedding"] for row in rows), dtype=np.float32
+        ).reshape(len(rows), dim)
+        norms = np.linalg.norm(added, axis=1, keepdims=True)
+        norms[norms == 0] = np.inf  # Zero vectors score 0 against everything
+        
+        end = self.count + len(rows)
+        self.vectors[self.count:end] = added / norms
+        self.rowids[self.count:end] = [row["rowid"] for row in rows]
+        self.agents[self.count:end] = [row["agent_name"] for row in rows]
+        self.count = end
+        self.synced_rowid = rows[-1]["rowid"]
 
 
 class AgentMemorySystem:
@@ -47,12 +237,74 @@ class AgentMemorySystem:
             db_path = str(data_dir / "agent_memory.db")
             
         self.db_path = db_path
+        self._local = threading.local()  # One connection per thread
+        # Every connection opened (e.g. on executor threads), so close() can close them all
+        self._conns: List[sqlite3.Connection] = []
+        self._conn_lock = threading.Lock()
+        # HNSW indexes per embedding dimension (used when hnswlib is installed)
+        self._vec_indexes: Dict[int, Any] = {}
+        self._vec_index_synced: Dict[int, int] = {}  # Dimension -> last indexed rowid
+        self._vec_index_deleted: Dict[int, int] = {}  # Dimension -> labels marked deleted
+        self._vec_index_dirty = set()
+        self._vec_index_lock = threading.Lock()
+        # Exact-scan embedding matrices per dimension (used without hnswlib)
+        self._vec_matrices: Dict[int, _VecMatrix] = {}
+        # Pending metric deltas per agent: [queries, successes, time, tokens]
+        self._metric_deltas: Dict[str, List[float]] = {}
+        self._metric_writes = 0
+        self._metrics_flushed_at = time.monotonic()
+        self._metric_lock = threading.Lock()
         self._init_db()
         self._init_cache()
+        # Stored memories, counted once here and then kept up to date by writes
+        self._memory_count = self._get_conn().execute('SELECT COUNT(*) FROM memories').fetchone()[0]
+        
+    def __len__(self) -> int:
+        """Number of stored memories"""
+        return self._memory_count
         
+    def _get_conn(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening and configuring it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn not in self._conns:
+            # Connections stay on their thread; close() may close them from another one
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            # Let reads come straight from the OS page cache
+            conn.execute('PRAGMA mmap_size=268435456')
+            # REPLACE deletes must fire the full-text index delete trigger
+            conn.execute('PRAGMA recursive_triggers=ON')
+            conn.create_function('query_signature', 1, _sql_query_signature, deterministic=True)
+            conn.create_function('signature_similarity', 2, _sql_signature_similarity, deterministic=True)
+            with self._conn_lock:
+                self._conns.append(conn)
+            self._local.conn = conn
+        return conn
+        
+    def close(self):
+        """Flush metrics, persist vector indexes and close every thread's connection"""
+        self.flush_metrics()
+        self.save_vec_indexes()
+        with self._conn_lock:
+            conns, self._conns = self._conns, []
+        # Threads still holding a closed connection open a new one on next use
+        for conn in conns:
+            conn.close()
+        self._local.conn = None
+            
     def _init_db(self):
         """Initialize database schema"""
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._get_conn()
+        with conn:
+            # Larger pages suit the embedding BLOBs (only applies to a new database)
+            conn.execute('PRAGMA page_size=8192')
+            # WAL lets readers run alongside the writer and avoids an fsync per commit
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA wal_autocheckpoint=1000')
+            
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS memories (
                     id TEXT PRIMARY KEY,
@@ -65,16 +317,38 @@ class AgentMemorySystem:
                     success INTEGER NOT NULL,
                     execution_time REAL,
                     tokens_used INTEGER,
-                    embedding TEXT,
-                    created_at REAL DEFAULT (strftime('%s', 'now'))
+                    embedding BLOB,
+                    created_at REAL DEFAULT (strftime('%s', 'now')),
+                    query_sig BLOB
                 )
             ''')
             
+            # Databases created before query signatures existed
+            columns = {row["name"] for row in conn.execute('PRAGMA table_info(memories)')}
+            if "query_sig" not in columns:
+                conn.execute('ALTER TABLE memories ADD COLUMN query_sig BLOB')
+            conn.execute('UPDATE memories SET query_sig = query_signature(query) WHERE query_sig IS NULL')
+            
             # Create indexes for performance
             conn.execute('CREATE INDEX IF NOT EXISTS idx_agent_name ON memories(agent_name)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON memories(timestamp)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_success ON memories(success)')
             
+            # Full-text index for similarity candidates, if this SQLite has FTS5
+            try:
+                fts_exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'memories_fts'"
+                ).fetchone() is not None
+                for statement in _FTS_SCHEMA:
+                    conn.execute(statement)
+                if not fts_exists:
+                    # Index memories stored before the index existed
+                    conn.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+                self._has_fts = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"FTS5 unavailable, falling back to recent-memory scan: {e}")
+                self._has_fts = False
+            
             # Create performance metrics table
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS agent_metrics (
@@ -92,101 +366,167 @@ class AgentMemorySystem:
     def _init_cache(self):
         """Initialize in-memory cache"""
         self.cache = {
-            "recent_queries": {},  # Agent -> List of recent queries
-            "embeddings": {},      # Query hash -> embedding
-            "metrics": {}          # Agent -> metrics
+            "recent_queries": defaultdict(lambda: deque(maxlen=100)),  # Agent -> last 100 queries
+            "embeddings": {}       # Query hash -> embedding
         }
+        self._cached_agent_metrics = lru_cache(maxsize=256)(self._load_agent_metrics)
         
     def store_interaction(self, entry: MemoryEntry) -> bool:
         """Store a successful interaction"""
+        return self.store_interactions([entry])
+        
+    def store_interactions(self, entries: Iterable[MemoryEntry]) -> bool:
+        """Store a batch of interactions in a single transaction"""
+        entries = list(entries)
+        if not entries:
+            return True
+            
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Store memory
-                conn.execute('''
-                    INSERT OR REPLACE INTO memories 
-                    (id, agent_name, query, response, prompt, metadata, 
-                     timestamp, success, execution_time, tokens_used, embedding)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    entry.id,
-                    entry.agent_name,
-                    entry.query,
-                    entry.response,
-                    entry.prompt,
-                    json.dumps(entry.metadata),
-                    entry.timestamp.timestamp(),
-                    int(entry.success),
-                    entry.execution_time,
-                    entry.tokens_used,
-                    json.dumps(entry.embedding) if entry.embedding else None
-                ))
+            conn = self._get_conn()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                
+                # Ids already stored are replaced rather than added
+                ids = list({entry.id for entry in entries})
+                replaced = conn.execute(
+                    f'SELECT COUNT(*) FROM memories WHERE id IN ({",".join("?" * len(ids))})', ids
+                ).fetchone()[0]
                 
-                # Update metrics
-                conn.execute('''
-                    INSERT OR REPLACE INTO agent_metrics 
-                    (agent_name, total_queries, successful_queries, total_time, total_tokens)
-                    VALUES (
-                        ?,
-                        COALESCE((SELECT total_queries FROM agent_metrics WHERE agent_name = ?), 0) + 1,
-                        COALESCE((SELECT successful_queries FROM agent_metrics WHERE agent_name = ?), 0) + ?,
-                        COALESCE((SELECT total_time FROM agent_metrics WHERE agent_name = ?), 0) + ?,
-                        COALESCE((SELECT total_tokens FROM agent_metrics WHERE agent_name = ?), 0) + ?
+                # Store memories
+                conn.executemany(_INSERT_MEMORY_SQL, [
+                    (
+                        entry.id,
+                        entry.agent_name,
+                        entry.query,
+                        entry.response,
+                        entry.prompt,
+                        json.dumps(entry.metadata),
+                        entry.timestamp.timestamp(),
+                        int(entry.success),
+                        entry.execution_time,
+                        entry.tokens_used,
+                        _embedding_to_blob(entry.embedding),
+                        _query_signature(_query_tokens(entry.query))
                     )
-                ''', (
-                    entry.agent_name,
-                    entry.agent_name,
-                    entry.agent_name, int(entry.success),
-                    entry.agent_name, entry.execution_time,
-                    entry.agent_name, entry.tokens_used
-                ))
+                    for entry in entries
+                ])
                 
                 conn.commit()
                 
-                # Update cache
-                if entry.agent_name not in self.cache["recent_queries"]:
-                    self.cache["recent_queries"][entry.agent_name] = []
-                self.cache["recent_queries"][entry.agent_name].append(entry.query)
+            with self._metric_lock:
+                self._memory_count += len(ids) - replaced
+            self._record_metric_deltas(entries)
+            
+            # Update cache, keeping only the last 100 queries per agent
+            recent_queries = self.cache["recent_queries"]
+            for entry in entries:
+                recent_queries[entry.agent_name].append(entry.query)
                 
-                # Keep only last 100 queries per agent in cache
-                if len(self.cache["recent_queries"][entry.agent_name]) > 100:
-                    self.cache["recent_queries"][entry.agent_name] = \
-                        self.cache["recent_queries"][entry.agent_name][-100:]
-                        
                 logger.info(f"Stored memory for {entry.agent_name}: {entry.id}")
-                return True
+            return True
                 
         except Exception as e:
             logger.error(f"Failed to store memory: {e}")
             return False
             
+    def _record_metric_deltas(self, entries: List[MemoryEntry]):
+        """Add stored entries to the pending metric deltas, flushing when due"""
+        with self._metric_lock:
+            for entry in entries:
+                delta = self._metric_deltas.get(entry.agent_name)
+                if delta is None:
+                    delta = self._metric_deltas[entry.agent_name] = [0, 0, 0.0, 0]
+                delta[0] += 1
+                delta[1] += int(entry.success)
+                delta[2] += entry.execution_time
+                delta[3] += entry.tokens_used
+            self._metric_writes += len(entries)
+            due = (self._metric_writes >= _METRICS_FLUSH_WRITES or
+                   time.monotonic() - self._metrics_flushed_at >= _METRICS_FLUSH_SECONDS)
+            
+        if due:
+            self.flush_metrics()
+            
+    def flush_metrics(self) -> bool:
+        """Write pending metric deltas to the database, one upsert per agent"""
+        with self._metric_lock:
+            pending = self._metric_deltas
+            self._metric_deltas = {}
+            self._metric_writes = 0
+            self._metrics_flushed_at = time.monotonic()
+            
+        if not pending:
+            return True
+            
+        try:
+            conn = self._get_conn()
+            with conn:
+                conn.executemany(_UPSERT_METRICS_SQL, [
+                    (agent_name, *delta) for agent_name, delta in pending.items()
+                ])
+                
+            # Cached totals no longer include the flushed deltas
+            self._cached_agent_metrics.cache_clear()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to flush agent metrics: {e}")
+            # Keep the deltas for the next flush
+            with self._metric_lock:
+                for agent_name, delta in pending.items():
+                    current = self._metric_deltas.setdefault(agent_name, [0, 0, 0.0, 0])
+                    for i, value in enumerate(delta):
+                        current[i] += value
+            return False
+            
     def retrieve_similar(self, query: str, agent_name: str = None, 
                         limit: int = 5, min_similarity: float = 0.7) -> List[MemoryEntry]:
         """Retrieve similar past interactions"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            conn = self._get_conn()
+            with conn:
                 # Simple keyword-based similarity for now
                 # In production, use proper embeddings
-                keywords = set(query.lower().split())
+                keywords = _query_tokens(query)
                 
-                base_query = '''
-                    SELECT * FROM memories 
-                    WHERE success = 1
-                '''
-                
-                params = []
+                # Rows whose keyword signatures are far below the threshold are rejected
+                # in SQL, before they take up candidate slots. Hash collisions make the
+                # signature approximate, so this only discards clear misses.
+                params = [_query_signature(keywords), min_similarity * 0.5]
+                prefilter = ' AND signature_similarity(m.query_sig, ?) >= ?'
+                if self._has_fts and keywords:
+                    # Candidates share at least one keyword; best BM25 matches first
+                    base_query = '''
+                        SELECT m.rowid, m.query FROM memories_fts 
+                        JOIN memories m ON m.rowid = memories_fts.rowid
+                        WHERE memories_fts MATCH ? AND m.success = 1
+                    ''' + prefilter
+                    params.insert(0, _fts_match_expression(keywords))
+                    order_by = ' ORDER BY bm25(memories_fts) LIMIT 100'
+                else:
+                    base_query = '''
+                        SELECT rowid, query FROM memories m
+                        WHERE success = 1
+                    ''' + prefilter
+                    order_by = ' ORDER BY timestamp DESC LIMIT 100'
+                    
                 if agent_name:
                     base_query += ' AND agent_name = ?'
                     params.append(agent_name)
                     
-                base_query += ' ORDER BY timestamp DESC LIMIT 100'
+                base_query += order_by
                 
                 cursor = conn.execute(base_query, params)
                 
-                # Score and filter results
+                rows = cursor.fetchall()
+                if not rows:
+                    return []
+                    
+                # Score on the query text alone (exact Jaccard stays the acceptance
+                # test, since callers reuse these memories as answers)
                 scored_results = []
-                for row in cursor:
-                    memory_query = row[2].lower()  # query column
-                    memory_keywords = set(memory_query.split())
+                for row in rows:
+                    memory_keywords = _query_tokens(row["query"])
                     
                     # Calculate Jaccard similarity
                     intersection = len(keywords & memory_keywords)
@@ -194,76 +534,233 @@ class AgentMemorySystem:
                     similarity = intersection / union if union > 0 else 0
                     
                     if similarity >= min_similarity:
-                        entry = self._row_to_memory_entry(row)
-                        scored_results.append((similarity, entry))
+                        scored_results.append((similarity, row["rowid"]))
                         
-                # Sort by similarity and return top results
+                # Sort by similarity, then load full payloads for the top results only
                 scored_results.sort(key=lambda x: x[0], reverse=True)
-                return [entry for _, entry in scored_results[:limit]]
+                winners = [rowid for _, rowid in scored_results[:limit]]
+                if not winners:
+                    return []
+                    
+                placeholders = ",".join("?" * len(winners))
+                by_rowid = {
+                    row["rowid"]: row for row in conn.execute(
+                        f'SELECT rowid, {_MEMORY_ENTRY_COLUMNS} FROM memories WHERE rowid IN ({placeholders})',
+                        winners
+                    )
+                }
+                return [self._row_to_memory_entry(by_rowid[rowid]) for rowid in winners]
                 
         except Exception as e:
             logger.error(f"Failed to retrieve similar memories: {e}")
             return []
             
-    def get_agent_performance_metrics(self, agent_name: str) -> Dict[str, Any]:
-        """Get performance metrics for an agent"""
+    def retrieve_similar_vec(self, query_embedding: List[float], agent_name: str = None,
+                            limit: int = 5, min_similarity: float = 0.7) -> List[MemoryEntry]:
+        """Retrieve past interactions by cosine similarity of stored embeddings"""
         try:
-            # Check cache first
-            if agent_name in self.cache["metrics"]:
-                cache_entry = self.cache["metrics"][agent_name]
-                if cache_entry["timestamp"] > datetime.now().timestamp() - 300:  # 5 min cache
-                    return cache_entry["metrics"]
-                    
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT * FROM agent_metrics WHERE agent_name = ?
-                ''', (agent_name,))
+            query_vec = np.asarray(query_embedding, dtype=np.float32)
+            query_norm = np.linalg.norm(query_vec)
+            if query_vec.ndim != 1 or query_norm == 0 or limit <= 0:
+                return []
                 
-                row = cursor.fetchone()
-                if row:
-                    metrics = {
-                        "total_queries": row[1],
-                        "successful_queries": row[2],
-                        "success_rate": row[2] / row[1] if row[1] > 0 else 0,
-                        "average_time": row[3] / row[1] if row[1] > 0 else 0,
-                        "total_tokens": row[4],
-                        "average_tokens": row[4] / row[1] if row[1] > 0 else 0
-                    }
+            conn = self._get_conn()
+            with conn:
+                if HAS_HNSWLIB:
+                    candidates = self._ann_vec_candidates(conn, query_vec, limit, agent_name)
                 else:
-                    metrics = {
-                        "total_queries": 0,
-                        "successful_queries": 0,
-                        "success_rate": 1.0,
-                        "average_time": 0,
-                        "total_tokens": 0,
-                        "average_tokens": 0
-                    }
+                    candidates = self._exact_vec_candidates(conn, query_vec, query_norm, limit, agent_name)
                     
-                # Get recent performance trends
-                cursor = conn.execute('''
-                    SELECT success, execution_time, tokens_used, timestamp
-                    FROM memories 
-                    WHERE agent_name = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT 10
-                ''', (agent_name,))
-                
-                recent = cursor.fetchall()
-                if recent:
-                    recent_success_rate = sum(r[0] for r in recent) / len(recent)
-                    recent_avg_time = sum(r[1] for r in recent) / len(recent)
+                candidates = [(rowid, sim) for rowid, sim in candidates if sim >= min_similarity]
+                if not candidates:
+                    return []
                     
-                    metrics["recent_success_rate"] = recent_success_rate
-                    metrics["recent_avg_time"] = recent_avg_time
-                    metrics["trend"] = "improving" if recent_success_rate > metrics["success_rate"] else "stable"
+                # Fetch only the winning rows; the filters also drop index entries
+                # whose rows were deleted or belong to another agent
+                placeholders = ",".join("?" * len(candidates))
+                fetch_query = f'''
+                    SELECT rowid, {_MEMORY_ENTRY_COLUMNS} FROM memories 
+                    WHERE rowid IN ({placeholders}) AND success = 1
+                '''
+                params = [rowid for rowid, _ in candidates]
+                if agent_name:
+                    fetch_query += ' AND agent_name = ?'
+                    params.append(agent_name)
                     
-                # Cache the metrics
-                self.cache["metrics"][agent_name] = {
-                    "timestamp": datetime.now().timestamp(),
-                    "metrics": metrics
-                }
+                by_rowid = {row["rowid"]: row for row in conn.execute(fetch_query, params)}
+                return [
+                    self._row_to_memory_entry(by_rowid[rowid])
+                    for rowid, _ in candidates if rowid in by_rowid
+                ][:limit]
+                
+        except Exception as e:
+            logger.error(f"Failed to retrieve similar memories by embedding: {e}")
+            return []
+            
+    def _exact_vec_candidates(self, conn: sqlite3.Connection, query_vec: np.ndarray, 
+                              query_norm: float, limit: int, 
+                              agent_name: str = None) -> List[Tuple[int, float]]:
+        """Score every comparable embedding; returns the top (rowid, similarity) pairs"""
+        with self._vec_index_lock:
+            matrix = self._get_vec_matrix(conn, query_vec.shape[0])
+            count = matrix.count
+            # Rows are pre-normalized, so one matrix-vector product gives cosine similarities
+            similarities = matrix.vectors[:count] @ (query_vec / query_norm)
+            rowids = matrix.rowids[:count]
+            if agent_name:
+                mask = matrix.agents[:count] == agent_name
+                similarities = similarities[mask]
+                rowids = rowids[mask]
                 
-                return metrics
+        if len(similarities) == 0:
+            return []
+            
+        # Partial selection of the top candidates, then order them. Over-fetch a
+        # little, since rows replaced or deleted since the last sync are dropped later
+        k = min(2 * limit, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(int(rowids[i]), float(similarities[i])) for i in top]
+        
+    def _get_vec_matrix(self, conn: sqlite3.Connection, dim: int) -> _VecMatrix:
+        """Get the embedding matrix for a dimension, adding rows stored since its last sync"""
+        matrix = self._vec_matrices.get(dim)
+        if matrix is None:
+            matrix = self._vec_matrices[dim] = _VecMatrix.empty(dim)
+            
+        # Only float32 blobs of the query's dimension are comparable
+        rows = conn.execute('''
+            SELECT rowid, agent_name, embedding FROM memories 
+            WHERE rowid > ? AND success = 1 
+            AND typeof(embedding) = 'blob' AND length(embedding) = ?
+            ORDER BY rowid
+        ''', (matrix.synced_rowid, dim * 4)).fetchall()
+        if rows:
+            matrix.extend(rows)
+        return matrix
+        
+    def _ann_vec_candidates(self, conn: sqlite3.Connection, query_vec: np.ndarray, 
+                            limit: int, agent_name: str = None) -> List[Tuple[int, float]]:
+        """Approximate nearest neighbours from the HNSW index as (rowid, similarity) pairs"""
+        with self._vec_index_lock:
+            dim = query_vec.shape[0]
+            index = self._get_vec_index(conn, dim)
+            # Deleted labels still count as elements but are never returned
+            count = index.get_current_count() - self._vec_index_deleted[dim]
+            if count == 0:
+                return []
+                
+            # Over-fetch so agent filtering and deleted rows still leave enough results
+            k = min(count, limit * (10 if agent_name else 3))
+            index.set_ef(max(k, 50))
+            labels, distances = index.knn_query(query_vec, k=k)
+            
+        # Cosine distance is 1 - cosine similarity
+        return [(int(label), 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+        
+    def _vec_index_path(self, dim: int) -> Optional[str]:
+        """Where the HNSW index for a dimension is persisted, next to the database"""
+        if self.db_path == ":memory:":
+            return None
+        return f"{self.db_path}.{dim}.hnsw"
+        
+    def _get_vec_index(self, conn: sqlite3.Connection, dim: int):
+        """Load or create the HNSW index for a dimension and add rows stored since its last sync"""
+        index = self._vec_indexes.get(dim)
+        if index is None:
+            index = hnswlib.Index(space='cosine', dim=dim)
+            path = self._vec_index_path(dim)
+            if path and os.path.exists(path):
+                index.load_index(path)
+                labels = index.get_ids_list()
+                self._vec_index_synced[dim] = max(labels) if labels else 0
+                # Rows deleted since the index was saved (e.g. by another process)
+                live = {row[0] for row in conn.execute(
+                    'SELECT rowid FROM memories WHERE rowid <= ?', (self._vec_index_synced[dim],)
+                )}
+                stale = [label for label in labels if label not in live]
+                self._mark_vec_labels_deleted(dim, index, stale)
+                self._vec_index_deleted[dim] = len(stale)
+            else:
+                index.init_index(max_elements=1024, ef_construction=200, M=16)
+                self._vec_index_synced[dim] = 0
+                self._vec_index_deleted[dim] = 0
+            self._vec_indexes[dim] = index
+            
+        # Rowids grow with each insert, so new memories are those past the last synced rowid
+        rows = conn.execute('''
+            SELECT rowid, embedding FROM memories 
+            WHERE rowid > ? AND success = 1 
+            AND typeof(embedding) = 'blob' AND length(embedding) = ?
+            ORDER BY rowid
+        ''', (self._vec_index_synced[dim], dim * 4)).fetchall()
+        
+        if rows:
+            needed = index.get_current_count() + len(rows)
+            if needed > index.get_max_elements():
+                index.resize_index(max(needed, 2 * index.get_max_elements()))
+            vectors = np.frombuffer(
+                b"".join(row["embedding"] for row in rows), dtype=np.float32
+            ).reshape(len(rows), dim)
+            index.add_items(vectors, [row["rowid"] for row in rows])
+            self._vec_index_synced[dim] = rows[-1]["rowid"]
+            self._vec_index_dirty.add(dim)
+            
+        return index
+        
+    def _mark_vec_labels_deleted(self, dim: int, index, labels: Iterable[int]) -> int:
+        """Hide rowids from an HNSW index; returns how many were newly marked"""
+        marked = 0
+        for label in labels:
+            try:
+                index.mark_deleted(label)
+                marked += 1
+            except RuntimeError:
+                pass  # Never indexed (no embedding, failed query) or already marked
+        if marked:
+            self._vec_index_dirty.add(dim)
+        return marked
+        
+    def _forget_vec_rows(self, rowids: List[int]):
+        """Drop deleted rows from the in-memory vector indexes"""
+        with self._vec_index_lock:
+            self._vec_matrices.clear()  # Rebuilt on next use
+            # Indexes not loaded yet drop stale labels when they are loaded
+            for dim, index in self._vec_indexes.items():
+                self._vec_index_deleted[dim] += self._mark_vec_labels_deleted(dim, index, rowids)
+                
+    def _reset_vec_indexes(self):
+        """Discard all vector indexes and their files so they are rebuilt from the table"""
+        with self._vec_index_lock:
+            self._vec_matrices.clear()
+            self._vec_indexes.clear()
+            self._vec_index_synced.clear()
+            self._vec_index_deleted.clear()
+            self._vec_index_dirty.clear()
+            if self.db_path != ":memory:":
+                db_file = Path(self.db_path)
+                for path in db_file.parent.glob(f"{db_file.name}.*.hnsw"):
+                    path.unlink(missing_ok=True)
+                    
+    def save_vec_indexes(self):
+        """Persist HNSW indexes that changed since they were loaded"""
+        with self._vec_index_lock:
+            for dim in list(self._vec_index_dirty):
+                path = self._vec_index_path(dim)
+                if path:
+                    self._vec_indexes[dim].save_index(path)
+                self._vec_index_dirty.discard(dim)
+                
+    def get_agent_performance_metrics(self, agent_name: str) -> Dict[str, Any]:
+        """Get performance metrics for an agent"""
+        try:
+            # Stored totals are cached per agent for the current 5 minute window
+            # (monotonic, so wall-clock adjustments neither expire nor pin entries)
+            row = self._cached_agent_metrics(agent_name, int(time.monotonic() // 300))
+            with self._metric_lock:
+                pending = self._metric_deltas.get(agent_name)
+                pending = list(pending) if pending else None
+            return self._build_agent_metrics(row, pending)
                 
         except Exception as e:
             logger.error(f"Failed to get agent metrics: {e}")
@@ -274,10 +771,57 @@ class AgentMemorySystem:
                 "error": str(e)
             }
             
+    def _load_agent_metrics(self, agent_name: str, time_bucket: int) -> Dict[str, Any]:
+        """Load totals and recent trend for an agent in one query (time_bucket only keys the cache)"""
+        conn = self._get_conn()
+        with conn:
+            row = conn.execute(_AGENT_METRICS_SQL, (agent_name, agent_name)).fetchone()
+        return dict(row)
+        
+    @staticmethod
+    def _build_agent_metrics(row: Dict[str, Any], pending: Optional[List[float]]) -> Dict[str, Any]:
+        """Combine stored totals with deltas not yet flushed"""
+        if row["total_queries"] is not None or pending:
+            total = row["total_queries"] or 0
+            successful = row["successful_queries"] or 0
+            total_time = row["total_time"] or 0
+            total_tokens = row["total_tokens"] or 0
+            if pending:
+                total += pending[0]
+                successful += pending[1]
+                total_time += pending[2]
+                total_tokens += pending[3]
+            metrics = {
+                "total_queries": total,
+                "successful_queries": successful,
+                "success_rate": successful / total if total > 0 else 0,
+                "average_time": total_time / total if total > 0 else 0,
+                "total_tokens": total_tokens,
+                "average_tokens": total_tokens / total if total > 0 else 0
+            }
+        else:
+            metrics = {
+                "total_queries": 0,
+                "successful_queries": 0,
+                "success_rate": 1.0,
+                "average_time": 0,
+                "total_tokens": 0,
+                "average_tokens": 0
+            }
+            
+        # Recent performance trends
+        if row["recent_count"]:
+            metrics["recent_success_rate"] = row["recent_success_rate"]
+            metrics["recent_avg_time"] = row["recent_avg_time"]
+            metrics["trend"] = "improving" if row["recent_success_rate"] > metrics["success_rate"] else "stable"
+            
+        return metrics
+        
     def get_successful_patterns(self, agent_name: str, min_occurrences: int = 3) -> List[Dict]:
         """Identify successful patterns for an agent"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            conn = self._get_conn()
+            with conn:
                 # Get successful queries
                 cursor = conn.execute('''
                     SELECT query, prompt, COUNT(*) as count, AVG(execution_time) as avg_time
@@ -292,10 +836,10 @@ class AgentMemorySystem:
                 patterns = []
                 for row in cursor:
                     patterns.append({
-                        "query_pattern": row[0],
-                        "prompt_used": row[1],
-                        "occurrences": row[2],
-                        "avg_execution_time": row[3]
+                        "query_pattern": row["query"],
+                        "prompt_used": row["prompt"],
+                        "occurrences": row["count"],
+                        "avg_execution_time": row["avg_time"]
                     })
                     
                 return patterns
@@ -304,24 +848,44 @@ class AgentMemorySystem:
             logger.error(f"Failed to get successful patterns: {e}")
             return []
             
-    def cleanup_old_memories(self, days: int = 30):
-        """Remove old memories to manage database size"""
+    def cleanup_old_memories(self, days: int = 30, vacuum: bool = False):
+        """Remove old memories to manage database size (vacuum=True also rewrites the file)"""
         try:
-            cutoff = (datetime.now() - timedelta(days=days)).timestamp()
-            
-            with sqlite3.connect(self.db_path) as conn:
-                # Keep recent memories and all successful ones from last 7 days
-                conn.execute('''
-                    DELETE FROM memories 
-                    WHERE timestamp < ? 
-                    AND (success = 0 OR timestamp < ?)
-                ''', (cutoff, (datetime.now() - timedelta(days=7)).timestamp()))
-                
-                deleted = conn.total_changes
+            now = datetime.now()
+            cutoff = (now - timedelta(days=days)).timestamp()
+            
+            conn = self._get_conn()
+            with conn:
+                # Keep recent memories and all successful ones from last 7 days.
+                # Candidates come from the timestamp index range, then go by rowid.
+                deleted_rowids = [row[0] for row in conn.execute('''
+                    DELETE FROM memories WHERE rowid IN (
+                        SELECT rowid FROM memories INDEXED BY idx_timestamp
+                        WHERE timestamp < ? 
+                        AND (success = 0 OR timestamp < ?)
+                    )
+                    RETURNING rowid
+                ''', (cutoff, (now - timedelta(days=7)).timestamp()))]
                 conn.commit()
                 
-                logger.info(f"Cleaned up {deleted} old memories")
-                return deleted
+            deleted = len(deleted_rowids)
+            if deleted:
+                with self._metric_lock:
+                    self._memory_count -= deleted
+                # Refresh planner statistics after a large change in table size
+                conn.execute('PRAGMA optimize')
+                if vacuum:
+                    conn.execute('VACUUM')
+                    # VACUUM may renumber rowids, which both the full-text and vector indexes key on
+                    if self._has_fts:
+                        with conn:
+                            conn.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+                    self._reset_vec_indexes()
+                else:
+                    self._forget_vec_rows(deleted_rowids)
+                    
+            logger.info(f"Cleaned up {deleted} old memories")
+            return deleted
                 
         except Exception as e:
             logger.error(f"Failed to cleanup memories: {e}")
@@ -329,9 +893,18 @@ class AgentMemorySystem:
             
     def export_memories(self, agent_name: str = None, format: str = "json") -> str:
         """Export memories for backup or analysis"""
+        # Could add CSV or other formats
+        out = io.BytesIO()
+        if not self.export_memories_to(out, agent_name):
+            return "{}"
+        return out.getvalue().decode()
+        
+    def export_memories_to(self, out: BinaryIO, agent_name: str = None) -> bool:
+        """Stream memories as a JSON array to a binary file-like object, one row at a time"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                query = 'SELECT * FROM memories'
+            conn = self._get_conn()
+            with conn:
+                query = f'SELECT {_MEMORY_ENTRY_COLUMNS} FROM memories'
                 params = []
                 
                 if agent_name:
@@ -339,44 +912,60 @@ class AgentMemorySystem:
                     params.append(agent_name)
                     
                 cursor = conn.execute(query, params)
+                cursor.arraysize = 1000
                 
-                memories = []
-                for row in cursor:
-                    entry = self._row_to_memory_entry(row)
-                    memories.append(asdict(entry))
-                    
-                if format == "json":
-                    return json.dumps(memories, indent=2, default=str)
-                else:
-                    # Could add CSV or other formats
-                    return json.dumps(memories, indent=2, default=str)
+                out.write(b"[")
+                separator = b"\n"
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    for row in rows:
+                        out.write(separator)
+                        out.write(orjson.dumps({
+                            "id": row["id"],
+                            "agent_name": row["agent_name"],
+                            "query": row["query"],
+                            "response": row["response"],
+                            "prompt": row["prompt"] or "",
+                            "metadata": orjson.loads(row["metadata"]) if row["metadata"] else {},
+                            "timestamp": datetime.fromtimestamp(row["timestamp"]),
+                            "success": bool(row["success"]),
+                            "execution_time": row["execution_time"] or 0.0,
+                            "tokens_used": row["tokens_used"] or 0,
+                            "embedding": _blob_to_embedding(row["embedding"])
+                        }))
+                        separator = b",\n"
+                out.write(b"\n]")
+                return True
                     
         except Exception as e:
             logger.error(f"Failed to export memories: {e}")
-            return "{}"
+            return False
             
-    def _row_to_memory_entry(self, row: Tuple) -> MemoryEntry:
+    def _row_to_memory_entry(self, row: sqlite3.Row) -> MemoryEntry:
         """Convert database row to MemoryEntry"""
+        # Only the top-ranked rows reach here, so decoding their embeddings is cheap
         return MemoryEntry(
-            id=row[0],
-            agent_name=row[1],
-            query=row[2],
-            response=row[3],
-            prompt=row[4] or "",
-            metadata=json.loads(row[5]) if row[5] else {},
-            timestamp=datetime.fromtimestamp(row[6]),
-            success=bool(row[7]),
-            execution_time=row[8] or 0.0,
-            tokens_used=row[9] or 0,
-            embedding=json.loads(row[10]) if row[10] else None
+            id=row["id"],
+            agent_name=row["agent_name"],
+            query=row["query"],
+            response=row["response"],
+            prompt=row["prompt"] or "",
+            metadata=orjson.loads(row["metadata"]) if row["metadata"] else {},
+            timestamp=datetime.fromtimestamp(row["timestamp"]),
+            success=bool(row["success"]),
+            execution_time=row["execution_time"] or 0.0,
+            tokens_used=row["tokens_used"] or 0,
+            embedding=_blob_to_embedding(row["embedding"])
         )
         
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two texts"""
         # Simple Jaccard similarity for now
         # In production, use proper embeddings
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
+        words1 = _query_tokens(text1)
+        words2 = _query_tokens(text2)
         
         intersection = len(words1 & words2)
         union = len(words1 | words2)
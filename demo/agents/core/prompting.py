@@ -2,10 +2,19 @@
 Structured prompting system for consistent, high-quality agent outputs
 """
 
-from typing import Dict, List, Optional, Any
-from datetime import datetime
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
+from datetime import date
+from dataclasses import dataclass, field
+from functools import lru_cache
 import json
+import re
+
+
+@lru_cache(maxsize=1)
+def _format_date(day: date) -> str:
+    """Prompt date line, formatted once per day"""
+    return day.strftime("%B %d, %Y")
 
 
 @dataclass
@@ -20,12 +29,21 @@ class PromptTemplate:
     examples: Optional[List[Dict]] = None
     output_format: Optional[str] = None
     
-    def render(self, **kwargs) -> str:
-        """Render the template with provided values"""
-        template = f"""<role>
+    # Static sections around the date and query, rendered once in __post_init__
+    _head: str = field(init=False, repr=False, compare=False)
+    _body: str = field(init=False, repr=False, compare=False)
+    _tail: str = field(init=False, repr=False, compare=False)
+    # Everything before the query, re-rendered only when the date changes
+    _prefix: str = field(default="", init=False, repr=False, compare=False)
+    _prefix_day: Optional[date] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._head = f"""<role>
 You are {self.role}, part of the LocalMind Collective multi-agent system.
 Your expertise: {self.expertise}
-Current date: {datetime.now().strftime("%B %d, %Y")}
+Current date: """
+
+        body = f"""
 </role>
 
 <context>
@@ -41,15 +59,22 @@ Current date: {datetime.now().strftime("%B %d, %Y")}
 </constraints>"""
 
         if self.examples:
-            template += f"\n\n<examples>\n{self._render_examples()}\n</examples>"
-            
-        if kwargs.get('query'):
-            template += f"\n\n<query>\n{kwargs['query']}\n</query>"
+            body += f"\n\n<examples>\n{self._render_examples()}\n</examples>"
             
-        if self.output_format:
-            template += f"\n\n<output_format>\n{self.output_format}\n</output_format>"
+        self._body = body
+        self._tail = f"\n\n<output_format>\n{self.output_format}\n</output_format>" if self.output_format else ""
+        
+    def render(self, **kwargs) -> str:
+        """Render the template with provided values"""
+        today = date.today()
+        if today != self._prefix_day:
+            self._prefix = self._head + _format_date(today) + self._body
+            self._prefix_day = today
             
-        return template
+        query = kwargs.get('query')
+        if query:
+            return f"{self._prefix}\n\n<query>\n{query}\n</query>{self._tail}"
+        return self._prefix + self._tail
     
     def _render_context(self) -> str:
         """Render context section"""
@@ -79,12 +104,67 @@ Current date: {datetime.now().strftime("%B %d, %Y")}
         return '\n'.join(examples_text)
 
 
+# JSON extraction patterns, tried in order by PromptValidator.validate_json_response
+_JSON_PATTERNS = (
+    re.compile(r'\{[^{}]*\}', re.DOTALL),  # Simple JSON
+    re.compile(r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}', re.DOTALL),  # Nested JSON
+    re.compile(r'```json\s*(.*?)\s*```', re.DOTALL),  # Markdown code block
+    re.compile(r'```\s*(.*?)\s*```', re.DOTALL)  # Generic code block
+)
+
+# Markdown clean-up patterns for PromptValidator.clean_response
+_THINK_RE = re.compile(r'<think[^>]*>.*?</think>', re.DOTALL)
+_THINKING_RE = re.compile(r'<thinking[^>]*>.*?</thinking>', re.DOTALL)
+_HEADER_BEFORE_RE = re.compile(r'\n(#{1,6})')
+_HEADER_AFTER_RE = re.compile(r'(#{1,6}[^\n]+)\n(?!\n)')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+# Meta-commentary phrases, matched anywhere in a line regardless of case
+_META_COMMENTARY_RE = re.compile(
+    r"okay,|i need to|looking at|let me|first,|i'll|i am|i will|now i|based on",
+    re.IGNORECASE
+)
+
+# PromptOptimizer.compress_prompt abbreviations, in lower and Title case
+_PROMPT_ABBREVIATIONS = {
+    "artificial intelligence": "AI",
+    "machine learning": "ML", 
+    "large language model": "LLM",
+    "natural language processing": "NLP",
+    "for example": "e.g.",
+    "that is": "i.e.",
+    "et cetera": "etc."
+}
+_PROMPT_ABBREVIATION_VARIANTS = {
+    variant: abbr
+    for full, abbr in _PROMPT_ABBREVIATIONS.items()
+    for variant in (full, full.title())
+}
+_PROMPT_ABBREVIATION_RE = re.compile(
+    "|".join(re.escape(phrase) for phrase in sorted(_PROMPT_ABBREVIATION_VARIANTS, key=len, reverse=True))
+)
+
+# Analysis templates by (agent_name, id(examples)) -> (examples, template)
+_ANALYSIS_TEMPLATES: "OrderedDict[Tuple[str, int], Tuple[Optional[List[Dict]], PromptTemplate]]" = OrderedDict()
+
+
 class StructuredPrompt:
     """Advanced structured prompting with validation and optimization"""
     
     @staticmethod
     def create_analysis_prompt(agent_name: str, query: str, examples: List[Dict] = None) -> str:
         """Create a structured analysis prompt"""
+        return StructuredPrompt._analysis_template(agent_name, examples).render(query=query)
+        
+    @staticmethod
+    def _analysis_template(agent_name: str, examples: Optional[List[Dict]]) -> PromptTemplate:
+        """Analysis template for an agent and example list, built once and reused"""
+        # Keyed by the examples' identity; the list is kept in the value so its id stays valid
+        key = (agent_name, id(examples))
+        cached = _ANALYSIS_TEMPLATES.get(key)
+        if cached is not None and cached[0] is examples:
+            _ANALYSIS_TEMPLATES.move_to_end(key)
+            return cached[1]
+            
         template = PromptTemplate(
             role=f"{agent_name} Analyst",
             expertise="query analysis and multi-agent orchestration",
@@ -119,18 +199,32 @@ class StructuredPrompt:
 }"""
         )
         
-        return template.render(query=query)
+        _ANALYSIS_TEMPLATES[key] = (examples, template)
+        if len(_ANALYSIS_TEMPLATES) > 64:
+            _ANALYSIS_TEMPLATES.popitem(last=False)
+        return template
     
     @staticmethod
     def create_synthesis_prompt(agent_name: str, query: str, findings: Dict[str, str], 
                               max_length: int = 500) -> str:
         """Create a structured synthesis prompt"""
-        template = PromptTemplate(
+        findings_text = "\n\n".join(
+            f"### {agent}\n{content[:500]}" for agent, content in findings.items()
+        )
+        
+        template = StructuredPrompt._synthesis_template(agent_name, max_length)
+        return template.render(query=query) + f"\n\n<agent_findings>\n{findings_text}\n</agent_findings>"
+        
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _synthesis_template(agent_name: str, max_length: int) -> PromptTemplate:
+        """Synthesis template for an agent and length limit, built once and reused"""
+        # The query and findings (which name the contributing agents) are rendered
+        # after the template, so everything before them is identical across queries
+        return PromptTemplate(
             role=f"{agent_name} Synthesizer",
             expertise="information synthesis and report generation",
             context={
-                "original_query": query,
-                "contributing_agents": list(findings.keys()),
                 "synthesis_goal": "coherent, actionable report"
             },
             task="Synthesize findings from multiple agents into a unified report",
@@ -151,13 +245,6 @@ Brief overview of findings (2-3 sentences)
 ## Conclusions
 Actionable insights and recommendations"""
         )
-        
-        # Add findings to context
-        findings_text = "\n\n".join(
-            f"### {agent}\n{content[:500]}" for agent, content in findings.items()
-        )
-        
-        return template.render(query=query) + f"\n\n<agent_findings>\n{findings_text}\n</agent_findings>"
     
     @staticmethod
     def create_cot_prompt(agent_name: str, query: str, thinking_steps: List[str]) -> str:
@@ -187,19 +274,9 @@ class PromptValidator:
     @staticmethod
     def validate_json_response(response: str) -> Optional[Dict]:
         """Extract and validate JSON from response"""
-        import re
-        
         # Try to find JSON in various formats
-        json_patterns = [
-            r'\{[^{}]*\}',  # Simple JSON
-            r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}',  # Nested JSON
-            r'```json\s*(.*?)\s*```',  # Markdown code block
-            r'```\s*(.*?)\s*```'  # Generic code block
-        ]
-        
-        for pattern in json_patterns:
-            matches = re.findall(pattern, response, re.DOTALL)
-            for match in matches:
+        for pattern in _JSON_PATTERNS:
+            for match in pattern.findall(response):
                 try:
                     # Clean up the match
                     if isinstance(match, tuple):
@@ -216,13 +293,11 @@ class PromptValidator:
     @staticmethod
     def clean_response(response: str, remove_thinking: bool = True) -> str:
         """Clean up response text while preserving markdown structure"""
-        import re
-        
         # Remove thinking tags if present
         if remove_thinking:
             # Remove <think> or <thinking> blocks
-            response = re.sub(r'<think[^>]*>.*?</think>', '', response, flags=re.DOTALL)
-            response = re.sub(r'<thinking[^>]*>.*?</thinking>', '', response, flags=re.DOTALL)
+            response = _THINK_RE.sub('', response)
+            response = _THINKING_RE.sub('', response)
             
         lines = response.split('\n')
         cleaned_lines = []
@@ -237,9 +312,7 @@ class PromptValidator:
                 continue
                 
             # Skip thinking/meta-commentary if requested (but not in code blocks)
-            if not in_code_block and remove_thinking and any(phrase in line.lower() for phrase in 
-                                     ['okay,', 'i need to', 'looking at', 'let me', 'first,', 
-                                      'i\'ll', 'i am', 'i will', 'now i', 'based on']):
+            if not in_code_block and remove_thinking and _META_COMMENTARY_RE.search(line):
                 skip_thinking = True
                 # Check if this line also has content
                 if any(marker in line for marker in ['#', '**', '-', '*', '1.', '2.', '3.']):
@@ -265,11 +338,11 @@ class PromptValidator:
         result = '\n'.join(cleaned_lines).strip()
         
         # Ensure proper spacing around headers
-        result = re.sub(r'\n(#{1,6})', r'\n\n\1', result)
-        result = re.sub(r'(#{1,6}[^\n]+)\n(?!\n)', r'\1\n\n', result)
+        result = _HEADER_BEFORE_RE.sub(r'\n\n\1', result)
+        result = _HEADER_AFTER_RE.sub(r'\1\n\n', result)
         
         # Remove multiple blank lines
-        result = re.sub(r'\n{3,}', '\n\n', result)
+        result = _BLANK_LINES_RE.sub('\n\n', result)
         
         return result.strip()
 
@@ -283,22 +356,8 @@ class PromptOptimizer:
         # Remove excessive whitespace
         prompt = ' '.join(prompt.split())
         
-        # Common abbreviations
-        replacements = {
-            "artificial intelligence": "AI",
-            "machine learning": "ML", 
-            "large language model": "LLM",
-            "natural language processing": "NLP",
-            "for example": "e.g.",
-            "that is": "i.e.",
-            "et cetera": "etc."
-        }
-        
-        for full, abbr in replacements.items():
-            prompt = prompt.replace(full, abbr)
-            prompt = prompt.replace(full.title(), abbr)
-            
-        return prompt
+        # Common abbreviations, in one pass
+        return _PROMPT_ABBREVIATION_RE.sub(lambda m: _PROMPT_ABBREVIATION_VARIANTS[m.group(0)], prompt)
     
     @staticmethod
     def add_format_enforcement(prompt: str, format_type: str = "json") -> str:
@@ -3,25 +3,79 @@ Resilience patterns for robust agent execution
 """
 
 import asyncio
+import random
+import time
 from typing import Any, Optional, Dict, Callable
-from datetime import datetime
+from collections import deque
+from dataclasses import dataclass, field
 import json
 from loguru import logger
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+# Fallback responses, built once. Plain-text templates take {name} and {retries};
+# the orchestrator's error fallback is serialized per call since it carries the error.
+_ORCHESTRATOR_TIMEOUT_FALLBACK = json.dumps({
+    "complexity": "moderate",
+    "domain": "general",
+    "agents_needed": ["Domain Specialist", "Web Harvester"],
+    "strategy": "parallel",
+    "key_aspects": ["main topic", "current information"],
+    "fallback": True,
+    "reason": "timeout"
+})
+_ORCHESTRATOR_ERROR_FALLBACK = {
+    "complexity": "complex",
+    "domain": "general", 
+    "agents_needed": ["Domain Specialist", "Web Harvester", "Fact Validator"],
+    "strategy": "sequential",
+    "key_aspects": ["comprehensive analysis needed"],
+    "fallback": True
+}
+_FALLBACK_TEMPLATES = {
+    "timeout": {
+        "researcher": "Unable to complete research due to timeout. The query appears to require further investigation.",
+        "validator": "Unable to validate claims due to timeout. Recommend manual verification.",
+        "default": "{name} was unable to complete the task due to timeout."
+    },
+    "error": {
+        "default": "{name} encountered an error. Please try a simpler query."
+    },
+    "circuit_breaker": {
+        "default": "{name} is temporarily unavailable due to repeated failures. Using cached response."
+    },
+    "max_retries": {
+        "default": "{name} could not complete after {retries} attempts."
+    }
+}
+
+# Hints appended to retried prompts, indexed by retry number (the second retry is attempt 3)
+_RETRY_HINTS = (
+    "\n\n(Note: Previous attempt may have failed. Please ensure your response follows the exact format specified.)",
+    "\n\n(Important: This is retry attempt 3. Please carefully follow all instructions and format requirements.)",
+    "\n\n(CRITICAL: Final attempt. Please provide a properly formatted response according to the specifications.)"
+)
+
+
 class ResilientAgentWrapper:
     """Wrap agents with resilience patterns - retry, fallback, circuit breaker"""
     
-    def __init__(self, agent, retry_count: int = 3, timeout_multiplier: float = 1.5):
+    def __init__(self, agent, retry_count: int = 3, timeout_multiplier: float = 1.5,
+                 idle_timeout: Optional[float] = 30.0):
         self.agent = agent
         self.retry_count = retry_count
         self.timeout_multiplier = timeout_multiplier
+        self.idle_timeout = idle_timeout  # Max gap between streamed tokens (soft timeout)
+        self.base_backoff = 0.5
+        self.max_backoff = 8.0
         self.fallback_responses = {}
-        self.error_history = []
+        self.error_history = deque()  # (monotonic time, error), oldest first
         self.circuit_breaker_threshold = 5
         self.circuit_breaker_reset_time = 300  # 5 minutes
-        self.circuit_open = False
+        self.circuit_state = "closed"  # closed | open | half_open
         self.circuit_opened_at = None
+        self._half_open_probe = False  # A half-open trial call is in flight
         
     async def run_with_resilience(self, prompt: str, stream_callback=None, 
                                  validation_fn: Optional[Callable] = None) -> str:
@@ -32,87 +86,125 @@ class ResilientAgentWrapper:
             logger.warning(f"Circuit breaker open for {self.agent.name}")
             return self._get_fallback_response("circuit_breaker")
             
-        original_timeout = self.agent.timeout
+        # In half-open state this call is the single trial call
+        probe = self.circuit_state == "half_open"
+        if probe:
+            self._half_open_probe = True
+            
+        base_timeout = self.agent.timeout
         
-        for attempt in range(self.retry_count):
-            try:
-                # Increase timeout with each retry
-                self.agent.timeout = int(original_timeout * (self.timeout_multiplier ** attempt))
-                
-                # Add retry context to prompt if not first attempt
-                enhanced_prompt = prompt
-                if attempt > 0:
-                    enhanced_prompt = self._add_retry_context(prompt, attempt)
-                    logger.info(f"Retry {attempt + 1}/{self.retry_count} for {self.agent.name}")
-                
-                # Execute agent
-                result = await self.agent.run(enhanced_prompt, stream_callback)
-                
-                # Validate response if validation function provided
-                if validation_fn:
-                    if not validation_fn(result):
+        try:
+            for attempt in range(self.retry_count):
+                last_attempt = attempt == self.retry_count - 1
+                try:
+                    # Increase timeout with each retry (passed per call, since the
+                    # agent may be shared by concurrent research requests)
+                    timeout = int(base_timeout * (self.timeout_multiplier ** attempt))
+                    
+                    # Add retry context to prompt if not first attempt
+                    enhanced_prompt = prompt
+                    if attempt > 0:
+                        enhanced_prompt = self._add_retry_context(prompt, attempt)
+                        logger.info(f"Retry {attempt + 1}/{self.retry_count} for {self.agent.name}")
+                    
+                    # Execute agent
+                    result = await self._run_watched(enhanced_prompt, stream_callback, timeout)
+                    
+                    # Validate response if validation function provided
+                    if validation_fn and not validation_fn(result):
                         logger.warning(f"Validation failed for {self.agent.name} on attempt {attempt + 1}")
-                        if attempt < self.retry_count - 1:
-                            continue
-                        else:
+                        if last_attempt:
                             return self._handle_validation_failure(result)
-                
-                # Success - reset circuit breaker
-                self._reset_circuit_breaker()
-                self.agent.timeout = original_timeout
-                return result
-                
-            except asyncio.TimeoutError:
-                logger.warning(f"Timeout for {self.agent.name} on attempt {attempt + 1}")
-                self._record_error("timeout")
-                
-                if attempt < self.retry_count - 1:
-                    # Exponential backoff
-                    await asyncio.sleep(2 ** attempt)
-                else:
-                    return self._get_fallback_response("timeout")
+                        continue
                     
-            except Exception as e:
-                logger.error(f"Error for {self.agent.name} on attempt {attempt + 1}: {e}")
-                self._record_error(str(e))
+                    # Success - reset circuit breaker
+                    self._reset_circuit_breaker()
+                    return result
+                    
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timeout for {self.agent.name} on attempt {attempt + 1}")
+                    self._record_error("timeout")
+                    if last_attempt:
+                        return self._get_fallback_response("timeout")
+                        
+                except Exception as e:
+                    logger.error(f"Error for {self.agent.name} on attempt {attempt + 1}: {e}")
+                    self._record_error(str(e))
+                    if last_attempt:
+                        return self._get_fallback_response("error", str(e))
+                        
+                # Back off only when another attempt follows
+                await asyncio.sleep(self._backoff_delay(attempt))
+        finally:
+            if probe:
+                self._half_open_probe = False
+                # A trial call that did not succeed re-opens the circuit
+                if self.circuit_state == "half_open":
+                    self._open_circuit()
+            
+        # Only reached when retry_count < 1
+        return self._get_fallback_response("max_retries")
+    
+    async def _run_watched(self, prompt: str, stream_callback, timeout: int) -> str:
+        """Run the agent, cancelling it if streaming stalls for longer than idle_timeout"""
+        if not self.idle_timeout:
+            return await self.agent.run(prompt, stream_callback, timeout=timeout)
+            
+        # Kept per call rather than on self, since concurrent requests share the wrapper
+        last_token_at = None
+        
+        async def watched_callback(event: Dict[str, Any]):
+            nonlocal last_token_at
+            if event.get("type") == "agent_stream":
+                last_token_at = time.monotonic()
+            if stream_callback:
+                await stream_callback(event)
                 
-                if attempt < self.retry_count - 1:
-                    await asyncio.sleep(2 ** attempt)
+        task = asyncio.create_task(self.agent.run(prompt, watched_callback, timeout=timeout))
+        try:
+            while True:
+                # Before the first token (model load, prompt eval) only the hard timeout applies
+                if last_token_at is None:
+                    wait = self.idle_timeout
                 else:
-                    return self._get_fallback_response("error", str(e))
-        
-        # Should not reach here, but just in case
-        self.agent.timeout = original_timeout
-        return self._get_fallback_response("max_retries")
+                    wait = last_token_at + self.idle_timeout - time.monotonic()
+                    if wait <= 0:
+                        logger.warning(f"{self.agent.name} stalled: no tokens for {self.idle_timeout}s")
+                        raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait({task}, timeout=wait)
+                if done:
+                    return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Capped exponential backoff with jitter, so parallel agents don't retry in lockstep"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() * 0.5)
     
     def _add_retry_context(self, prompt: str, attempt: int) -> str:
         """Add retry context to help the model succeed"""
-        retry_hints = [
-            "\n\n(Note: Previous attempt may have failed. Please ensure your response follows the exact format specified.)",
-            "\n\n(Important: This is retry attempt {}. Please carefully follow all instructions and format requirements.)",
-            "\n\n(CRITICAL: Final attempt. Please provide a properly formatted response according to the specifications.)"
-        ]
-        
-        if attempt < len(retry_hints):
-            return prompt + retry_hints[attempt - 1].format(attempt + 1)
-        return prompt + retry_hints[-1]
+        return prompt + _RETRY_HINTS[min(attempt, len(_RETRY_HINTS)) - 1]
     
     def _handle_validation_failure(self, result: str) -> str:
         """Handle validation failures gracefully"""
         # Try to extract useful content even if format is wrong
         logger.warning(f"Attempting to salvage response from {self.agent.name}")
         
-        # For JSON responses, try to fix common issues
-        if "{" in result and "}" in result:
-            # Try to extract JSON even if surrounded by text
-            import re
-            json_match = re.search(r'\{[^{}]*\}', result, re.DOTALL)
-            if json_match:
-                try:
-                    json.loads(json_match.group())
-                    return json_match.group()
-                except:
-                    pass
+        # For JSON responses, return the first complete (possibly nested) object
+        # even if surrounded by text
+        start = result.find("{")
+        while start != -1:
+            try:
+                _, end = _JSON_DECODER.raw_decode(result, start)
+                return result[start:end]
+            except json.JSONDecodeError:
+                start = result.find("{", start + 1)
         
         # Return the original result with a warning
         return f"[Warning: Response format validation failed]\n{result}"
@@ -120,58 +212,29 @@ class ResilientAgentWrapper:
     def _get_fallback_response(self, reason: str, error: str = None) -> str:
         """Get appropriate fallback response"""
         agent_role = self.agent.role
-        
-        fallbacks = {
-            "timeout": {
-                "orchestrator": json.dumps({
-                    "complexity": "moderate",
-                    "domain": "general",
-                    "agents_needed": ["Domain Specialist", "Web Harvester"],
-                    "strategy": "parallel",
-                    "key_aspects": ["main topic", "current information"],
-                    "fallback": True,
-                    "reason": "timeout"
-                }),
-                "researcher": "Unable to complete research due to timeout. The query appears to require further investigation.",
-                "validator": "Unable to validate claims due to timeout. Recommend manual verification.",
-                "default": f"{self.agent.name} was unable to complete the task due to timeout."
-            },
-            "error": {
-                "orchestrator": json.dumps({
-                    "complexity": "complex",
-                    "domain": "general", 
-                    "agents_needed": ["Domain Specialist", "Web Harvester", "Fact Validator"],
-                    "strategy": "sequential",
-                    "key_aspects": ["comprehensive analysis needed"],
-                    "fallback": True,
-                    "reason": f"error: {error}"
-                }),
-                "default": f"{self.agent.name} encountered an error. Please try a simpler query."
-            },
-            "circuit_breaker": {
-                "default": f"{self.agent.name} is temporarily unavailable due to repeated failures. Using cached response."
-            },
-            "max_retries": {
-                "default": f"{self.agent.name} could not complete after {self.retry_count} attempts."
-            }
-        }
-        
-        fallback_set = fallbacks.get(reason, fallbacks["error"])
-        return fallback_set.get(agent_role, fallback_set.get("default", "Fallback response"))
+        if reason not in _FALLBACK_TEMPLATES:
+            reason = "error"
+            
+        if agent_role == "orchestrator":
+            if reason == "timeout":
+                return _ORCHESTRATOR_TIMEOUT_FALLBACK
+            if reason == "error":
+                return json.dumps({**_ORCHESTRATOR_ERROR_FALLBACK, "reason": f"error: {error}"})
+                
+        templates = _FALLBACK_TEMPLATES[reason]
+        return templates.get(agent_role, templates["default"]).format(
+            name=self.agent.name, retries=self.retry_count
+        )
     
     def _record_error(self, error: str):
         """Record error for circuit breaker pattern"""
-        self.error_history.append({
-            "timestamp": datetime.now(),
-            "error": error
-        })
+        now = time.monotonic()
+        self.error_history.append((now, error))
         
         # Keep only recent errors (last 10 minutes)
-        cutoff = datetime.now().timestamp() - 600
-        self.error_history = [
-            e for e in self.error_history 
-            if e["timestamp"].timestamp() > cutoff
-        ]
+        cutoff = now - 600
+        while self.error_history[0][0] <= cutoff:
+            self.error_history.popleft()
         
         # Check if circuit should be opened
         if len(self.error_history) >= self.circuit_breaker_threshold:
@@ -179,78 +242,78 @@ class ResilientAgentWrapper:
     
     def _open_circuit(self):
         """Open the circuit breaker"""
-        self.circuit_open = True
-        self.circuit_opened_at = datetime.now()
+        self.circuit_state = "open"
+        self.circuit_opened_at = time.monotonic()
         logger.warning(f"Circuit breaker opened for {self.agent.name}")
     
     def _reset_circuit_breaker(self):
         """Reset circuit breaker on success"""
         if self.error_history:
             self.error_history.clear()
-        if self.circuit_open:
-            self.circuit_open = False
+        if self.circuit_state != "closed":
+            self.circuit_state = "closed"
             self.circuit_opened_at = None
             logger.info(f"Circuit breaker reset for {self.agent.name}")
     
     def _is_circuit_open(self) -> bool:
-        """Check if circuit is open and should remain open"""
-        if not self.circuit_open:
+        """Check if calls should be rejected (open, or half-open with a trial call in flight)"""
+        if self.circuit_state == "closed":
             return False
             
-        # Check if enough time has passed to try again
-        if self.circuit_opened_at:
-            elapsed = (datetime.now() - self.circuit_opened_at).seconds
-            if elapsed > self.circuit_breaker_reset_time:
-                # Try to close circuit
-                self.circuit_open = False
-                logger.info(f"Circuit breaker attempting reset for {self.agent.name}")
-                return False
-                
-        return True
+        if self.circuit_state == "open":
+            # Check if enough time has passed to try again
+            elapsed = time.monotonic() - self.circuit_opened_at
+            if elapsed <= self.circuit_breaker_reset_time:
+                return True
+            self.circuit_state = "half_open"
+            logger.info(f"Circuit breaker half-open for {self.agent.name}, allowing one trial call")
+            
+        # Half-open: admit one trial call at a time
+        return self._half_open_probe
+
+
+@dataclass(slots=True)
+class AgentExecutionMetrics:
+    """Running execution counters for one agent"""
+    total_executions: int = 0
+    successful_executions: int = 0
+    failed_executions: int = 0
+    total_time: float = 0
+    total_tokens: int = 0
+    error_types: Dict[str, int] = field(default_factory=dict)
 
 
 class AgentHealthMonitor:
     """Monitor agent health and performance"""
     
     def __init__(self):
-        self.agent_metrics = {}
+        self.agent_metrics: Dict[str, AgentExecutionMetrics] = {}
         
     def record_execution(self, agent_name: str, success: bool, 
                         execution_time: float, tokens: int = 0):
         """Record agent execution metrics"""
-        if agent_name not in self.agent_metrics:
-            self.agent_metrics[agent_name] = {
-                "total_executions": 0,
-                "successful_executions": 0,
-                "failed_executions": 0,
-                "total_time": 0,
-                "total_tokens": 0,
-                "error_types": {}
-            }
+        metrics = self.agent_metrics.get(agent_name)
+        if metrics is None:
+            metrics = self.agent_metrics[agent_name] = AgentExecutionMetrics()
             
-        metrics = self.agent_metrics[agent_name]
-        metrics["total_executions"] += 1
-        metrics["total_time"] += execution_time
-        metrics["total_tokens"] += tokens
+        metrics.total_executions += 1
+        metrics.total_time += execution_time
+        metrics.total_tokens += tokens
         
         if success:
-            metrics["successful_executions"] += 1
+            metrics.successful_executions += 1
         else:
-            metrics["failed_executions"] += 1
+            metrics.failed_executions += 1
             
     def get_agent_health(self, agent_name: str) -> Dict[str, Any]:
         """Get health metrics for an agent"""
-        if agent_name not in self.agent_metrics:
-            return {"status": "healthy", "success_rate": 1.0}
-            
-        metrics = self.agent_metrics[agent_name]
-        total = metrics["total_executions"]
-        
-        if total == 0:
+        metrics = self.agent_metrics.get(agent_name)
+        if metrics is None or metrics.total_executions == 0:
             return {"status": "healthy", "success_rate": 1.0}
             
-        success_rate = metrics["successful_executions"] / total
-        avg_time = metrics["total_time"] / total
+        total = metrics.total_executions
+        success_rate = metrics.successful_executions / total
+        avg_time = metrics.total_time / total
         
         # Determine health status
         if success_rate >= 0.95:
@@ -265,7 +328,7 @@ class AgentHealthMonitor:
             "success_rate": success_rate,
             "average_execution_time": avg_time,
             "total_executions": total,
-            "failed_executions": metrics["failed_executions"]
+            "failed_executions": metrics.failed_executions
         }
 
 
@@ -275,20 +338,26 @@ class FallbackChain:
     def __init__(self):
         self.strategies = []
         
-    def add_strategy(self, name: str, handler: Callable):
-        """Add a fallback strategy"""
-        self.strategies.append((name, handler))
+    def add_strategy(self, name: str, handler: Callable, timeout: Optional[float] = None):
+        """Add a fallback strategy, optionally limited to timeout seconds"""
+        self.strategies.append((name, handler, timeout))
         
     async def execute(self, *args, **kwargs) -> Any:
         """Execute strategies in order until one succeeds"""
         errors = []
         
-        for name, handler in self.strategies:
+        for name, handler, timeout in self.strategies:
             try:
                 logger.info(f"Attempting strategy: {name}")
-                result = await handler(*args, **kwargs)
+                # A slow strategy gives way to the next one once its budget is spent
+                # (wait_for rather than asyncio.timeout, which needs Python 3.11)
+                result = await asyncio.wait_for(handler(*args, **kwargs), timeout)
                 if result is not None:
                     return result
+            except asyncio.TimeoutError:
+                logger.warning(f"Strategy {name} timed out after {timeout}s")
+                errors.append((name, "timeout"))
+                continue
             except Exception as e:
                 logger.warning(f"Strategy {name} failed: {e}")
                 errors.append((name, str(e)))
@@ -5,6 +5,20 @@ Domain Specialist Agent - Provides expert domain analysis
 from .base import PresentationAgent, CURRENT_DATE
 
 
+_DOMAIN_PROMPT = """As a {domain} domain specialist, analyze this query:
+
+Query: {query}
+Today's date: {date}
+
+Provide expert analysis covering:
+1. Core concepts and principles
+2. Current state of the field
+3. Key challenges and opportunities
+4. Future implications
+
+Keep response concise (2-3 paragraphs) for live demo."""
+
+
 class DomainSpecialist(PresentationAgent):
     """Domain Specialist - uses qwen3:8b for domain expertise."""
     
@@ -19,17 +33,5 @@ class DomainSpecialist(PresentationAgent):
         
     async def analyze(self, query: str, domain: str, stream_callback=None) -> str:
         """Provide domain-specific analysis."""
-        prompt = f"""As a {domain} domain specialist, analyze this query:
-
-Query: {query}
-Today's date: {CURRENT_DATE}
-
-Provide expert analysis covering:
-1. Core concepts and principles
-2. Current state of the field
-3. Key challenges and opportunities
-4. Future implications
-
-Keep response concise (2-3 paragraphs) for live demo."""
-
+        prompt = _DOMAIN_PROMPT.format_map({"query": query, "domain": domain, "date": CURRENT_DATE})
         return await self.run(prompt, stream_callback)
\ No newline at end of file
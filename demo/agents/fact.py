@@ -5,6 +5,18 @@ Fact Validator Agent - Validates claims and checks accuracy
 from .base import PresentationAgent
 
 
+_VALIDATOR_PROMPT = """Fact-check this content:
+
+{content}  # Limited for speed
+
+Identify and validate 3-5 key claims. For each:
+1. State the claim
+2. Assess validity (High/Medium/Low confidence)
+3. Note any concerns
+
+Be concise - this is for a live demo."""
+
+
 class FactValidator(PresentationAgent):
     """Fact Validator - uses phi4-mini for quick validation."""
     
@@ -19,15 +31,5 @@ class FactValidator(PresentationAgent):
         
     async def validate(self, content: str, stream_callback=None) -> str:
         """Validate key claims in content."""
-        prompt = f"""Fact-check this content:
-
-{content[:1000]}  # Limited for speed
-
-Identify and validate 3-5 key claims. For each:
-1. State the claim
-2. Assess validity (High/Medium/Low confidence)
-3. Note any concerns
-
-Be concise - this is for a live demo."""
-
+        prompt = _VALIDATOR_PROMPT.format_map({"content": content[:1000]})
         return await self.run(prompt, stream_callback)
\ No newline at end of file
@@ -3,17 +3,85 @@ Presentation Orchestrator - Manages multi-agent collaboration
 """
 
 import asyncio
+import hashlib
 import time
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from loguru import logger
 
+from .base import close_session
 from .principal import PrincipalSynthesizer
 from .domain import DomainSpecialist
-from .web import WebHarvester
+from .web import WebHarvester, close_brave_client
 from .fact import FactValidator
 from .quality import QualityAuditor
 
+# How long analyses and reports are reused for a repeated query
+_CACHE_TTL = 300.0
+
+
+def _query_key(query: str) -> str:
+    """Cache key for a query, ignoring case and surrounding whitespace"""
+    return hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+
+
+def _join_capped(parts: List[str], cap: int) -> str:
+    """Same as " ".join(parts)[:cap], without building the full string"""
+    out = []
+    room = cap
+    for i, part in enumerate(parts):
+        if i:
+            if room <= 0:
+                break
+            out.append(" ")
+            room -= 1
+        if room <= 0:
+            break
+        out.append(part[:room])
+        room -= len(part)
+    return "".join(out)
+
+
+class _BatchedStream:
+    """Stream callback that coalesces events emitted in the same event-loop turn"""
+    
+    def __init__(self, callback):
+        self._callback = callback
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()  # Keeps batches in order
+        self._error: Optional[Exception] = None  # First failed send, e.g. a closed WebSocket
+        
+    async def __call__(self, event: Dict[str, Any]):
+        # A failed background send aborts the pipeline, as an awaited send would have
+        if self._error is not None:
+            raise self._error
+        self._pending.append(event)
+        if self._flush_task is None:
+            # Runs once the caller next waits on real work
+            self._flush_task = asyncio.create_task(self._send_soon())
+            
+    async def _send_soon(self):
+        """Background send; a failure is kept and raised to the next caller"""
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            self._error = e
+            
+    async def flush(self):
+        """Send pending events, as one "batch" event when there are several"""
+        async with self._send_lock:
+            if self._error is not None:
+                raise self._error
+            if not self._pending:
+                return
+            events, self._pending = self._pending, []
+            if len(events) == 1:
+                await self._callback(events[0])
+            else:
+                await self._callback({"type": "batch", "events": events})
+
 
 class PresentationOrchestrator:
     """Orchestrates agents for live presentation with visual feedback."""
@@ -25,10 +93,38 @@ class PresentationOrchestrator:
         self.fact_validator = FactValidator()
         self.quality_auditor = QualityAuditor()
         self.memory_store = {}  # Simple memory for demo
+        # Query key -> (expires_at, analysis); (query key, mode) -> (expires_at, result)
+        self._analysis_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._result_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        
+    async def aclose(self):
+        """Close the HTTP clients the agents share (Ollama session, Brave search)."""
+        await close_session()
+        await close_brave_client()
         
     async def research(self, query: str, mode: str = "auto", stream_callback=None) -> Dict[str, Any]:
         """Execute multi-agent research with streaming updates."""
+        stream = _BatchedStream(stream_callback) if stream_callback else None
+        try:
+            return await self._research(query, mode, stream)
+        finally:
+            if stream:
+                await stream.flush()
+    
+    async def _research(self, query: str, mode: str, stream_callback) -> Dict[str, Any]:
+        """Research pipeline; stream_callback coalesces events into batches"""
         start_time = time.time()
+        key = _query_key(query)
+        
+        # A repeated query within the TTL replays the previous result
+        cached_result = self._cache_get(self._result_cache, (key, mode))
+        if cached_result is not None:
+            if stream_callback:
+                await stream_callback({
+                    "type": "cache_hit",
+                    "message": "Using recent response for this query"
+                })
+            return cached_result
         
         # Phase 1: Analysis
         if stream_callback:
@@ -38,7 +134,18 @@ class PresentationOrchestrator:
                 "message": "Analyzing query"
             })
         
-        analysis = await self.principal.analyze_query(query, stream_callback)
+        analysis = self._cache_get(self._analysis_cache, key)
+        harvester_task = None
+        if analysis is None:
+            # The Web Harvester is nearly always selected, so start it (with default
+            # aspects) alongside the analysis and cancel it if the analysis leaves it out
+            harvester_task = asyncio.create_task(self._run_web_harvester(query, {}, stream_callback))
+            try:
+                analysis = await self.principal.analyze_query(query, stream_callback)
+            except BaseException:
+                harvester_task.cancel()
+                raise
+            self._cache_put(self._analysis_cache, key, analysis)
         
         if stream_callback:
             await stream_callback({
@@ -66,34 +173,58 @@ class PresentationOrchestrator:
         
         # Execute agents (parallel for demo effect)
         tasks = []
+        order = []  # Agent names in findings order
         if "Domain Specialist" in agents:
-            tasks.append(self._run_domain_specialist(query, analysis, stream_callback))
+            tasks.append(asyncio.create_task(self._run_domain_specialist(query, analysis, stream_callback)))
+            order.append("Domain Specialist")
         if "Web Harvester" in agents:
-            tasks.append(self._run_web_harvester(query, analysis, stream_callback))
-            
-        if tasks:
-            results = await asyncio.gather(*tasks)
-            for agent_name, result in results:
-                findings[agent_name] = result
-        
-        # Phase 3: Validation (if needed)
-        if "Fact Validator" in agents and findings:
+            tasks.append(harvester_task or asyncio.create_task(
+                self._run_web_harvester(query, analysis, stream_callback)
+            ))
+            order.append("Web Harvester")
+        elif harvester_task:
+            harvester_task.cancel()
             if stream_callback:
                 await stream_callback({
-                    "type": "agent_start",
-                    "agent": "Fact Validator",
-                    "message": "Validating findings"
+                    "type": "agent_complete",
+                    "agent": "Web Harvester"
                 })
             
-            combined = " ".join(findings.values())[:1000]
-            validation = await self.fact_validator.validate(combined, stream_callback)
-            findings["Fact Validator"] = validation
-            
+        # Phase 3: Validation (if needed), overlapping the research still running.
+        # The validator only reads the first 1000 characters of the combined findings,
+        # so it starts once the leading findings cover them.
+        validate = "Fact Validator" in agents
+        validation_task = None
+        results = {}
+        
+        # Stream each finding as soon as its agent finishes
+        for next_done in asyncio.as_completed(tasks):
+            agent_name, result = await next_done
+            results[agent_name] = result
             if stream_callback:
                 await stream_callback({
-                    "type": "agent_complete",
-                    "agent": "Fact Validator"
+                    "type": "partial_finding",
+                    "agent": agent_name,
+                    "result": result
                 })
+                
+            if validate and validation_task is None:
+                leading = []
+                length = -1  # Length of " ".join(leading)
+                for name in order:
+                    if name not in results or length >= 1000:
+                        break
+                    leading.append(results[name])
+                    length += len(results[name]) + 1
+                if length >= 1000 or len(leading) == len(order):
+                    combined = _join_capped(leading, 1000)
+                    validation_task = asyncio.create_task(self._run_fact_validator(combined, stream_callback))
+                    
+        for agent_name in order:
+            findings[agent_name] = results[agent_name]
+                
+        if validation_task:
+            findings["Fact Validator"] = await validation_task
         
         # Phase 4: Synthesis
         if stream_callback:
@@ -138,7 +269,7 @@ class PresentationOrchestrator:
         
         total_time = time.time() - start_time
         
-        return {
+        result = {
             "query": query,
             "analysis": analysis,
             "agents_used": list(findings.keys()),
@@ -150,6 +281,27 @@ class PresentationOrchestrator:
             "web_search_used": self.web_harvester.has_brave,
             "memory_items": len(self.memory_store)
         }
+        self._cache_put(self._result_cache, (key, mode), result)
+        return result
+    
+    @staticmethod
+    def _cache_get(cache: Dict, key) -> Optional[Dict[str, Any]]:
+        """Get a cached value if it has not expired"""
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del cache[key]
+            return None
+        return entry[1]
+    
+    @staticmethod
+    def _cache_put(cache: Dict, key, value: Dict[str, Any]):
+        """Cache a value for _CACHE_TTL seconds, dropping expired entries"""
+        now = time.monotonic()
+        for stale in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+            del cache[stale]
+        cache[key] = (now + _CACHE_TTL, value)
     
     async def _run_domain_specialist(self, query: str, analysis: Dict[str, Any], callback):
         """Run domain specialist."""
@@ -183,4 +335,20 @@ class PresentationOrchestrator:
                 "type": "agent_complete",
                 "agent": "Web Harvester"
             })
-        return ("Web Harvester", result)
\ No newline at end of file
+        return ("Web Harvester", result)
+    
+    async def _run_fact_validator(self, combined: str, callback):
+        """Run fact validator."""
+        if callback:
+            await callback({
+                "type": "agent_start",
+                "agent": "Fact Validator",
+                "message": "Validating findings"
+            })
+        result = await self.fact_validator.validate(combined, callback)
+        if callback:
+            await callback({
+                "type": "agent_complete",
+                "agent": "Fact Validator"
+            })
+        return result
\ No newline at end of file
@@ -4,13 +4,14 @@ Enhanced Production-Ready Orchestrator with all improvements
 
 import asyncio
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set
 from datetime import datetime
 from loguru import logger
 
 # Import enhanced components
 from .principal_enhanced import ImprovedPrincipalSynthesizer
 from .principal import PrincipalSynthesizer
+from .base import embed_text
 from .domain import DomainSpecialist
 from .web import WebHarvester
 from .fact import FactValidator
@@ -22,13 +23,30 @@ from .core.communication import AgentCommunicationProtocol, AgentHandoff, AgentC
 from .core.memory import AgentMemorySystem, MemoryEntry
 from .core.dynamic import PromptCache, DynamicPromptBuilder
 
+# Cosine similarity at which a past query counts as a paraphrase of the current one
+_SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Memory writes allowed in flight before research() waits for one to finish
+_MAX_PENDING_WRITES = 16
+
+# Characters of each finding the Principal reads when synthesizing (its own prompt limit)
+_SYNTHESIS_EXCERPT_CHARS = 500
+
+
+def _approx_tokens(text: str) -> int:
+    """Rough token count from the spaces in text, without splitting it into a list"""
+    return text.count(" ") + 1 if text else 0
+
 
 class ProductionOrchestrator:
     """Production-ready orchestrator with all enhancements"""
     
-    def __init__(self, use_enhanced: bool = True):
+    def __init__(self, use_enhanced: bool = True, speculative_phase1: bool = True):
         """Initialize with option to use enhanced or standard agents"""
         
+        # Start the usual research agents while the Principal is still analyzing
+        self.speculative_phase1 = speculative_phase1
+        
         # Choose agent implementations
         if use_enhanced:
             logger.info("Initializing enhanced production orchestrator")
@@ -37,6 +55,9 @@ class ProductionOrchestrator:
             logger.info("Initializing standard orchestrator")
             self.principal = PrincipalSynthesizer()
             
+        # analyze_query/synthesize_findings live on the agent itself, inside any wrapper
+        self._principal_impl = getattr(self.principal, 'agent', self.principal)
+            
         # Initialize other agents with resilience wrappers
         self.domain_specialist = ResilientAgentWrapper(DomainSpecialist())
         self.web_harvester = ResilientAgentWrapper(WebHarvester())
@@ -50,6 +71,8 @@ class ProductionOrchestrator:
         self.health_monitor = AgentHealthMonitor()
         self.prompt_cache = PromptCache()
         self.prompt_builder = DynamicPromptBuilder()
+        # Background memory writes, held so they aren't garbage collected mid-flight
+        self._pending_writes: Set[asyncio.Task] = set()
         
         # Set agent dependencies
         self._setup_dependencies()
@@ -66,9 +89,18 @@ class ProductionOrchestrator:
         start_time = time.time()
         logger.info(f"Starting enhanced research for: {query}")
         
-        # Check memory for similar past queries
+        # Check memory for similar past queries; embeddings let paraphrases hit,
+        # with keyword matching as the fallback when no embedding model is available
+        query_embedding = None
         if use_memory:
-            similar_memories = self.memory_system.retrieve_similar(query, limit=3)
+            query_embedding = await embed_text(query)
+            if query_embedding is not None:
+                similar_memories = self.memory_system.retrieve_similar_vec(
+                    query_embedding, agent_name="orchestrator", limit=1,
+                    min_similarity=_SEMANTIC_CACHE_THRESHOLD
+                )
+            else:
+                similar_memories = self.memory_system.retrieve_similar(query, limit=3)
             quality_score = similar_memories[0].metadata.get("quality_score", 0) if similar_memories else 0
             # Ensure quality_score is numeric (handle dict case)
             if isinstance(quality_score, dict):
@@ -97,54 +129,72 @@ class ProductionOrchestrator:
                 "message": "Analyzing query with enhanced reasoning"
             })
             
-        # Always use analyze_query to ensure we get a dict
-        # TODO: Fix cache to properly handle structured responses
-        if hasattr(self.principal, 'agent'):
-            analysis = await self.principal.agent.analyze_query(query, stream_callback)
+        # Reuse the parsed analysis of the same or a paraphrased query
+        analysis = self.prompt_cache.get_result("principal_analysis", query, query_embedding)
+        speculative = {}
+        if analysis is not None:
+            logger.info(f"Reusing cached analysis for query: '{query[:50]}...'")
         else:
-            analysis = await self.principal.analyze_query(query, stream_callback)
-            
-        # Record analysis success
-        if isinstance(analysis, dict) and "complexity" in analysis:
-            self.prompt_cache.store(
-                "principal_analysis", 
-                query, 
-                "structured_analysis_prompt",  # Placeholder
-                success=True,
-                response_quality=0.9
-            )
-            
+            # The analysis nearly always selects the Domain Specialist and Web Harvester,
+            # so start them (with default parameters) alongside it and cancel whichever
+            # the analysis leaves out
+            if self.speculative_phase1:
+                # Their handoffs carry the same defaults as the empty analysis they get, so
+                # the Domain Specialist's prompt can't pick up the previous query's handoff
+                for agent_name in ("Domain Specialist", "Web Harvester"):
+                    self.communication.record_handoff(self._agent_handoff(query, agent_name, {}))
+                speculative = {
+                    "Domain Specialist": asyncio.create_task(
+                        self._run_domain_specialist_enhanced(query, {}, stream_callback)
+                    ),
+                    "Web Harvester": asyncio.create_task(
+                        self._run_web_harvester_enhanced(query, {}, stream_callback)
+                    )
+                }
+                
+            # Always use analyze_query to ensure we get a dict
+            try:
+                analysis = await self._principal_impl.analyze_query(query, stream_callback)
+            except BaseException:
+                for task in speculative.values():
+                    task.cancel()
+                raise
+                
+            # Record analysis success, keeping the parsed analysis for similar queries
+            if isinstance(analysis, dict) and "complexity" in analysis:
+                self.prompt_cache.store(
+                    "principal_analysis", 
+                    query, 
+                    "structured_analysis_prompt",  # Placeholder
+                    success=True,
+                    response_quality=0.9,
+                    result=analysis,
+                    query_embedding=query_embedding
+                )
+                
         if stream_callback:
             await stream_callback({
                 "type": "agent_complete",
                 "agent": "Principal Synthesizer"
             })
             
-        # Create handoff for next agents
-        analysis_handoff = AgentHandoff(
-            from_agent="Principal Synthesizer",
-            to_agent="Multiple",
-            query=query,
-            key_findings={
-                "complexity": analysis.get("complexity", "moderate"),
-                "domain": analysis.get("domain", "general"),
-                "strategy": analysis.get("strategy", "parallel")
-            },
-            recommendations=analysis.get("agents_needed", ["Domain Specialist", "Web Harvester"]),
-            priority_aspects=analysis.get("key_aspects", [])
-        )
-        
         # Phase 2: Coordinated Agent Execution
         findings = {}
+        findings_tokens = 0
+        # Findings trimmed once as they arrive; the full text stays in findings
+        excerpts = {}
         agents_requested = analysis.get("agents_needed", ["Domain Specialist", "Web Harvester"])
         
         # Force all agents in expert mode
         if mode == "expert":
             agents_requested = ["Domain Specialist", "Web Harvester", "Fact Validator", "Quality Auditor"]
             logger.info("Expert mode: Engaging all agents for comprehensive analysis")
+            
+        await self._cancel_speculative(speculative, agents_requested, stream_callback)
         
         # Calculate optimal execution order
         execution_levels = self.coordinator.calculate_execution_order(agents_requested)
+        validate = False
         
         for level in execution_levels:
             # Execute agents in parallel within each level
@@ -155,22 +205,23 @@ class ProductionOrchestrator:
                 if self.coordinator.should_skip_agent(agent_name):
                     continue
                     
+                # Add agent task, reusing a speculative run if one was started
+                # (its handoff was recorded when it started and is what it saw)
+                if agent_name in speculative:
+                    level_tasks.append(speculative.pop(agent_name))
+                    continue
+                    
                 # Create agent-specific handoff
-                await self.communication.agent_handoff(AgentHandoff(
-                    from_agent="Principal Synthesizer",
-                    to_agent=agent_name,
-                    query=query,
-                    key_findings=analysis_handoff.key_findings,
-                    priority_aspects=analysis_handoff.priority_aspects
-                ))
+                self.communication.record_handoff(self._agent_handoff(query, agent_name, analysis))
                 
-                # Add agent task
                 if agent_name == "Domain Specialist":
                     level_tasks.append(self._run_domain_specialist_enhanced(query, analysis, stream_callback))
                 elif agent_name == "Web Harvester":
                     level_tasks.append(self._run_web_harvester_enhanced(query, analysis, stream_callback))
                 elif agent_name == "Fact Validator":
-                    level_tasks.append(self._run_fact_validator_enhanced(query, findings, stream_callback))
+                    # Fact Validator runs alongside synthesis, once the research is in
+                    validate = True
+                    continue
                 elif agent_name == "Quality Auditor":
                     # Quality Auditor runs after synthesis, so skip here
                     continue
@@ -186,16 +237,30 @@ class ProductionOrchestrator:
                     elif isinstance(result, tuple) and len(result) == 2:
                         agent_name, agent_result = result
                         findings[agent_name] = agent_result
+                        excerpts[agent_name] = agent_result[:_SYNTHESIS_EXCERPT_CHARS]
+                        tokens = _approx_tokens(agent_result)
+                        findings_tokens += tokens
                         
                         # Record execution
                         self.health_monitor.record_execution(
                             agent_name,
                             success=True,
                             execution_time=time.time() - start_time,
-                            tokens=len(agent_result.split())
+                            tokens=tokens
                         )
                         
-        # Phase 3: Enhanced Synthesis
+        # Speculative runs for agents the coordinator skipped
+        await self._cancel_speculative(speculative, (), stream_callback)
+        
+        # Phase 3: Enhanced Synthesis, with fact validation running alongside it.
+        # The validator only reads the research findings, so its result joins
+        # the findings after synthesis rather than delaying it
+        validation_task = None
+        if validate:
+            validation_task = asyncio.create_task(
+                self._run_fact_validator_enhanced(query, dict(findings), stream_callback)
+            )
+            
         if stream_callback:
             await stream_callback({
                 "type": "agent_start",
@@ -211,16 +276,17 @@ class ProductionOrchestrator:
             key_findings={"agents_contributed": list(findings.keys())},
             confidence=0.9 if len(findings) >= 2 else 0.7
         )
-        await self.communication.agent_handoff(synthesis_handoff)
+        self.communication.record_handoff(synthesis_handoff)
         
         # Get websites from context
         websites = self.communication.get_global_context("websites_explored") or []
         
-        # Access wrapped agent if needed
-        if hasattr(self.principal, 'agent'):
-            final_report = await self.principal.agent.synthesize_findings(query, findings, stream_callback, websites)
-        else:
-            final_report = await self.principal.synthesize_findings(query, findings, stream_callback, websites)
+        try:
+            final_report = await self._principal_impl.synthesize_findings(query, excerpts, stream_callback, websites)
+        except BaseException:
+            if validation_task is not None:
+                validation_task.cancel()
+            raise
         
         if stream_callback:
             await stream_callback({
@@ -228,6 +294,21 @@ class ProductionOrchestrator:
                 "agent": "Principal Synthesizer"
             })
             
+        if validation_task is not None:
+            try:
+                agent_name, agent_result = await validation_task
+                findings[agent_name] = agent_result
+                tokens = _approx_tokens(agent_result)
+                findings_tokens += tokens
+                self.health_monitor.record_execution(
+                    agent_name,
+                    success=True,
+                    execution_time=time.time() - start_time,
+                    tokens=tokens
+                )
+            except Exception as e:
+                logger.error(f"Agent failed: {e}")
+                
         # Phase 4: Quality Assessment (if requested)
         quality_score = None
         if mode == "expert" and "Quality Auditor" in agents_requested:
@@ -248,6 +329,7 @@ class ProductionOrchestrator:
                 
         # Store successful interaction in memory
         total_time = time.time() - start_time
+        agents_used = list(findings)
         memory_entry = MemoryEntry(
             agent_name="orchestrator",
             query=query,
@@ -255,40 +337,85 @@ class ProductionOrchestrator:
             prompt="",  # Complex multi-agent prompt
             metadata={
                 "mode": mode,
-                "agents_used": list(findings.keys()),
+                "agents_used": agents_used,
                 "quality_score": quality_score,
                 "complexity": analysis.get("complexity", "unknown"),
                 "domain": analysis.get("domain", "general")
             },
             success=True,
             execution_time=total_time,
-            tokens_used=sum(len(f.split()) for f in findings.values())
+            tokens_used=findings_tokens,
+            embedding=query_embedding
         )
-        self.memory_system.store_interaction(memory_entry)
-        logger.info(f"💾 CACHING: Stored successful interaction for future use")
-        logger.info(f"   Query: '{query[:50]}...'")
-        logger.info(f"   Quality score: {quality_score}")
-        logger.info(f"   Execution time: {total_time:.1f}s")
+        await self._schedule_memory_write(memory_entry)
         
         # Return enhanced result
         return {
             "query": query,
             "analysis": analysis,
-            "agents_used": list(findings.keys()),
+            "agents_used": agents_used,
             "findings": findings,
             "synthesis": final_report,
             "quality_score": quality_score,
             "execution_time": round(total_time, 1),
-            "total_tokens": sum(len(f.split()) for f in findings.values()) + len(final_report.split()),
+            "total_tokens": findings_tokens + _approx_tokens(final_report),
             "timestamp": datetime.now().isoformat(),
             "performance_metrics": {
                 agent: self.health_monitor.get_agent_health(agent)
-                for agent in findings.keys()
+                for agent in agents_used
             },
             "communication_summary": self.communication.get_conversation_summary(),
             "cache_stats": self.prompt_cache.get_cache_stats()
         }
         
+    async def _schedule_memory_write(self, entry: MemoryEntry):
+        """Store a research result in the background so the response isn't held up"""
+        if len(self._pending_writes) >= _MAX_PENDING_WRITES:
+            await asyncio.wait(self._pending_writes, return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.create_task(self._persist_memory(entry))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+        
+    async def _persist_memory(self, entry: MemoryEntry):
+        """Store a memory entry on a worker thread, off the event loop"""
+        if await asyncio.to_thread(self.memory_system.store_interaction, entry):
+            logger.info(f"💾 CACHING: Stored successful interaction for future use")
+            logger.info(f"   Query: '{entry.query[:50]}...'")
+            logger.info(f"   Quality score: {entry.metadata.get('quality_score')}")
+            logger.info(f"   Execution time: {entry.execution_time:.1f}s")
+            
+    async def drain_pending_writes(self):
+        """Wait for background memory writes to finish (call on application shutdown)"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+            
+    @staticmethod
+    def _agent_handoff(query: str, agent_name: str, analysis: Dict[str, Any]) -> AgentHandoff:
+        """Principal Synthesizer handoff to one agent, with defaults for what the analysis lacks"""
+        return AgentHandoff(
+            from_agent="Principal Synthesizer",
+            to_agent=agent_name,
+            query=query,
+            key_findings={
+                "complexity": analysis.get("complexity", "moderate"),
+                "domain": analysis.get("domain", "general"),
+                "strategy": analysis.get("strategy", "parallel")
+            },
+            priority_aspects=analysis.get("key_aspects", [])
+        )
+        
+    async def _cancel_speculative(self, speculative: Dict[str, asyncio.Task], 
+                                  keep, callback):
+        """Cancel speculative agent runs that are not in keep"""
+        for agent_name in [name for name in speculative if name not in keep]:
+            speculative.pop(agent_name).cancel()
+            logger.info(f"Discarding speculative {agent_name} run")
+            if callback:
+                await callback({
+                    "type": "agent_complete",
+                    "agent": agent_name
+                })
+                
     async def _run_domain_specialist_enhanced(self, query: str, analysis: Dict[str, Any], 
                                             callback) -> tuple:
         """Run domain specialist with enhancements"""
@@ -326,7 +453,7 @@ class ProductionOrchestrator:
             "Domain Specialist",
             success=True,
             execution_time=time.time() - start,
-            tokens=len(result.split())
+            tokens=_approx_tokens(result)
         )
         
         if callback:
@@ -367,7 +494,7 @@ class ProductionOrchestrator:
             "Web Harvester",
             success=True,
             execution_time=time.time() - start,
-            tokens=len(content.split())
+            tokens=_approx_tokens(content)
         )
         
         if callback:
@@ -398,7 +525,7 @@ class ProductionOrchestrator:
             "Fact Validator",
             success=True,
             execution_time=time.time() - start,
-            tokens=len(result.split())
+            tokens=_approx_tokens(result)
         )
         
         if callback:
@@ -432,7 +559,7 @@ class ProductionOrchestrator:
                 "Quality Auditor": self.health_monitor.get_agent_health("Quality Auditor")
             },
             "memory_system": {
-                "total_memories": len(self.memory_system.cache.get("recent_queries", {})),
+                "total_memories": len(self.memory_system),
                 "cache_performance": self.prompt_cache.get_cache_stats()
             },
             "communication": self.communication.get_conversation_summary()
@@ -2,28 +2,16 @@
 Principal Synthesizer Agent - Orchestrates multi-agent research
 """
 
-import json
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import orjson
 from loguru import logger
 from .base import PresentationAgent, CURRENT_DATE
 
 
-class PrincipalSynthesizer(PresentationAgent):
-    """Principal Synthesizer - uses deepseek-r1:8b for orchestration."""
-    
-    def __init__(self):
-        super().__init__(
-            name="Principal Synthesizer",
-            model="deepseek-r1:8b",
-            role="orchestrator",
-            temperature=0.1
-        )
-        self.timeout = 360  # 6 minutes for deep reasoning
-    
-    async def analyze_query(self, query: str, stream_callback=None) -> Dict[str, Any]:
-        """Analyze query and determine agent selection."""
-        prompt = f"""<Thinking>
+# Static instructions come first and the query last, so Ollama can reuse the
+# KV cache for the shared prefix across queries
+_ANALYSIS_PREFIX = f"""<Thinking>
 Today is {CURRENT_DATE}. I need to analyze this query to determine:
 1. Complexity level (simple/moderate/complex)
 2. Domain classification
@@ -31,9 +19,6 @@ Today is {CURRENT_DATE}. I need to analyze this query to determine:
 4. Optimal processing strategy
 </Thinking>
 
-Analyze this query for multi-agent processing:
-Query: {query}
-
 Provide analysis in JSON format:
 {{
     "complexity": "simple|moderate|complex",
@@ -41,38 +26,19 @@ Provide analysis in JSON format:
     "agents_needed": ["Domain Specialist", "Web Harvester"],
     "strategy": "parallel|sequential",
     "key_aspects": ["aspect1", "aspect2"]
-}}"""
+}}
 
-        response = await self.run(prompt, stream_callback)
-        
-        try:
-            json_match = re.search(r'\{[^{}]*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
-            
-        return {
-            "complexity": "moderate",
-            "domain": "general",
-            "agents_needed": ["Domain Specialist", "Web Harvester"],
-            "strategy": "parallel",
-            "key_aspects": ["main topic", "current state"]
-        }
-    
-    async def synthesize_findings(self, query: str, findings: Dict[str, str], stream_callback=None, websites: List[Dict[str, str]] = None) -> str:
-        """Synthesize agent findings into coherent report."""
-        findings_text = "\n\n".join(
-            f"=== {agent} ===\n{content[:500]}"  # Limit for speed
-            for agent, content in findings.items()
-        )
-        
-        prompt = f"""Synthesize these multi-agent findings into a coherent report:
+Analyze this query for multi-agent processing:
+"""
 
-Query: {query}
+# Synthesis clean-up: meta-commentary phrases matched anywhere in a line regardless
+# of case, and the start of the report proper
+_META_LINE_RE = re.compile(r"okay,|i need to|looking at|the user|let me", re.IGNORECASE)
+_REPORT_RE = re.compile(r'(#.*?Executive Summary.*)', re.DOTALL | re.IGNORECASE)
+# Characters that affect brace depth in JSON: braces, string quotes and escapes
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
 
-Agent Findings:
-{findings_text}
+_SYNTHESIS_PREFIX = """Synthesize the multi-agent findings below into a coherent report.
 
 IMPORTANT: Provide ONLY the final report content. Do not include any thinking, reasoning, or meta-commentary.
 Start directly with the report content.
@@ -88,7 +54,91 @@ Format the output as a clean markdown report with:
 - Key findings section
 - Conclusion
 
-Keep it brief for presentation (3-4 paragraphs total)."""
+Keep it brief for presentation (3-4 paragraphs total).
+
+"""
+
+
+def _object_end(text: str, start: int) -> Optional[int]:
+    """Index just past the JSON object opening at start, or None if it never closes"""
+    depth = 0
+    in_string = False
+    escaped_at = -1  # Position of the character escaped by a backslash
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        pos = match.start()
+        char = match.group()
+        if in_string:
+            if pos == escaped_at:
+                continue
+            if char == "\\":
+                escaped_at = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+    return None
+
+
+def _extract_analysis(text: str) -> Optional[Dict[str, Any]]:
+    """First JSON object in text (nesting allowed) that carries the analysis keys"""
+    start = text.find("{")
+    while start != -1:
+        end = _object_end(text, start)
+        if end is not None:
+            try:
+                candidate = orjson.loads(text[start:end])
+                if isinstance(candidate, dict) and "complexity" in candidate and "domain" in candidate:
+                    return candidate
+            except orjson.JSONDecodeError:
+                pass
+        # Retry from the next brace, which may open a nested or later object
+        start = text.find("{", start + 1)
+    return None
+
+
+class PrincipalSynthesizer(PresentationAgent):
+    """Principal Synthesizer - uses deepseek-r1:8b for orchestration."""
+    
+    def __init__(self):
+        super().__init__(
+            name="Principal Synthesizer",
+            model="deepseek-r1:8b",
+            role="orchestrator",
+            temperature=0.1
+        )
+        self.timeout = 360  # 6 minutes for deep reasoning
+    
+    async def analyze_query(self, query: str, stream_callback=None) -> Dict[str, Any]:
+        """Analyze query and determine agent selection."""
+        prompt = f"{_ANALYSIS_PREFIX}Query: {query}"
+        response = await self.run(prompt, stream_callback, {"response_format": "json"})
+        
+        analysis = _extract_analysis(response)
+        if analysis is not None:
+            return analysis
+            
+        return {
+            "complexity": "moderate",
+            "domain": "general",
+            "agents_needed": ["Domain Specialist", "Web Harvester"],
+            "strategy": "parallel",
+            "key_aspects": ["main topic", "current state"]
+        }
+    
+    async def synthesize_findings(self, query: str, findings: Dict[str, str], stream_callback=None, websites: List[Dict[str, str]] = None) -> str:
+        """Synthesize agent findings into coherent report."""
+        findings_text = "\n\n".join(
+            f"=== {agent} ===\n{content[:500]}"  # Limit for speed
+            for agent, content in findings.items()
+        )
+        
+        prompt = f"{_SYNTHESIS_PREFIX}Query: {query}\n\nAgent Findings:\n{findings_text}"
 
         # Add references if available
         if websites and len(websites) > 0:
@@ -107,7 +157,7 @@ Keep it brief for presentation (3-4 paragraphs total)."""
         
         for line in lines:
             # Skip lines that look like thinking or meta-commentary
-            if any(phrase in line.lower() for phrase in ['okay,', 'i need to', 'looking at', 'the user', 'let me']):
+            if _META_LINE_RE.search(line):
                 skip_until_content = True
                 continue
             
@@ -124,7 +174,7 @@ Keep it brief for presentation (3-4 paragraphs total)."""
         # If we still have thinking content, try to extract just the report
         if 'executive summary' in cleaned_response.lower() or '# ' in cleaned_response:
             # Find the start of the actual report
-            report_match = re.search(r'(#.*?Executive Summary.*)', cleaned_response, re.DOTALL | re.IGNORECASE)
+            report_match = _REPORT_RE.search(cleaned_response)
             if report_match:
                 cleaned_response = report_match.group(1)
         
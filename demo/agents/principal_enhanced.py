@@ -13,6 +13,43 @@ from .core.examples import AgentExamples
 from .core.resilience import ResilientAgentWrapper
 
 
+# Query-independent, so the examples, reasoning guide and template prefix ahead of
+# the query stay byte-identical and Ollama can reuse their KV cache
+_COT_SECTION = """
+<thinking_process>
+For the query below, I need to analyze step by step:
+
+1. **Topic Identification**: What is the core subject matter? Is it asking for information, comparison, analysis, or creation?
+
+2. **Complexity Assessment**:
+   - Simple: Single concept, straightforward answer, common knowledge
+   - Moderate: Multiple related concepts, some analysis needed, current information helpful
+   - Complex: Multi-faceted analysis, conflicting information possible, deep expertise required
+
+3. **Domain Classification**: Which field of knowledge does this primarily belong to?
+   - Technology: Computing, AI, software, hardware, internet
+   - Science: Physics, chemistry, biology, medicine, research
+   - Business: Economics, finance, management, marketing
+   - Health: Medical, wellness, nutrition, mental health
+   - General: Everyday topics, how-to guides, common knowledge
+
+4. **Agent Selection Logic**:
+   - Domain Specialist: Needed for deep technical analysis or expert knowledge
+   - Web Harvester: Needed for current events, recent developments, or varied perspectives
+   - Fact Validator: Needed when claims need verification or conflicting information exists
+   - Quality Auditor: Needed for complex outputs requiring quality assessment
+
+5. **Execution Strategy**:
+   - Sequential: When one agent's output informs another's input
+   - Parallel: When agents can work independently
+   - Hybrid: Mix of both for optimal efficiency
+
+Now let me apply this thinking to the specific query...
+</thinking_process>
+
+"""
+
+
 class ImprovedPrincipalSynthesizer(PresentationAgent):
     """Enhanced Principal Synthesizer with structured prompting and Chain-of-Thought reasoning."""
     
@@ -38,7 +75,7 @@ class ImprovedPrincipalSynthesizer(PresentationAgent):
         )
         
         # Add Chain-of-Thought reasoning
-        cot_prompt = self._add_cot_reasoning(prompt, query)
+        cot_prompt = self._add_cot_reasoning(prompt)
         
         # Run with context for optimization
         context = {
@@ -64,43 +101,9 @@ class ImprovedPrincipalSynthesizer(PresentationAgent):
             logger.error("Failed to parse analysis response")
             return self._create_enhanced_fallback(query)
             
-    def _add_cot_reasoning(self, base_prompt: str, query: str) -> str:
+    def _add_cot_reasoning(self, base_prompt: str) -> str:
         """Add Chain-of-Thought reasoning to prompt"""
-        cot_section = f"""
-<thinking_process>
-For the query "{query}", I need to analyze step by step:
-
-1. **Topic Identification**: What is the core subject matter? Is it asking for information, comparison, analysis, or creation?
-
-2. **Complexity Assessment**:
-   - Simple: Single concept, straightforward answer, common knowledge
-   - Moderate: Multiple related concepts, some analysis needed, current information helpful
-   - Complex: Multi-faceted analysis, conflicting information possible, deep expertise required
-
-3. **Domain Classification**: Which field of knowledge does this primarily belong to?
-   - Technology: Computing, AI, software, hardware, internet
-   - Science: Physics, chemistry, biology, medicine, research
-   - Business: Economics, finance, management, marketing
-   - Health: Medical, wellness, nutrition, mental health
-   - General: Everyday topics, how-to guides, common knowledge
-
-4. **Agent Selection Logic**:
-   - Domain Specialist: Needed for deep technical analysis or expert knowledge
-   - Web Harvester: Needed for current events, recent developments, or varied perspectives
-   - Fact Validator: Needed when claims need verification or conflicting information exists
-   - Quality Auditor: Needed for complex outputs requiring quality assessment
-
-5. **Execution Strategy**:
-   - Sequential: When one agent's output informs another's input
-   - Parallel: When agents can work independently
-   - Hybrid: Mix of both for optimal efficiency
-
-Now let me apply this thinking to the specific query...
-</thinking_process>
-
-{base_prompt}"""
-        
-        return cot_section
+        return _COT_SECTION + base_prompt
         
     def _validate_analysis_result(self, result: Dict[str, Any]) -> bool:
         """Validate that analysis result has all required fields"""
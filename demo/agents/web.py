@@ -3,10 +3,32 @@ Web Harvester Agent - Performs web research with optional Brave search
 """
 
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from loguru import logger
 import httpx
-from .base import PresentationAgent, CURRENT_DATE
+from .base import PresentationAgent, CURRENT_DATE, load_env
+
+# Shared client so Brave searches reuse a pooled keep-alive TLS connection
+_BRAVE_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def get_brave_client() -> httpx.AsyncClient:
+    """Get the shared Brave search client, creating it lazily on first use."""
+    global _BRAVE_CLIENT
+    if _BRAVE_CLIENT is None or _BRAVE_CLIENT.is_closed:
+        _BRAVE_CLIENT = httpx.AsyncClient(
+            timeout=5.0,
+            limits=httpx.Limits(max_connections=8, keepalive_expiry=60)
+        )
+    return _BRAVE_CLIENT
+
+
+async def close_brave_client():
+    """Close the shared Brave search client (call on application shutdown)."""
+    global _BRAVE_CLIENT
+    if _BRAVE_CLIENT is not None and not _BRAVE_CLIENT.is_closed:
+        await _BRAVE_CLIENT.aclose()
+    _BRAVE_CLIENT = None
 
 
 class WebHarvester(PresentationAgent):
@@ -20,6 +42,7 @@ class WebHarvester(PresentationAgent):
             temperature=0.3
         )
         self.timeout = 90  # 1.5 minutes for web research
+        load_env()  # .env may not have been read if OLLAMA_HOST came from the environment
         self.brave_api_key = os.getenv("BRAVE_API_KEY")
         self.has_brave = bool(self.brave_api_key)
         
@@ -96,13 +119,12 @@ Be specific and cite which websites provided which information."""
             "freshness": "pm"  # Past month
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=5.0)
-            if response.status_code == 200:
-                data = response.json()
-                return [{
-                    "title": item.get("title", ""),
-                    "url": item.get("url", ""),
-                    "description": item.get("description", "")
-                } for item in data.get("web", {}).get("results", [])]
-            return []
\ No newline at end of file
+        response = await get_brave_client().get(url, headers=headers, params=params)
+        if response.status_code == 200:
+            data = response.json()
+            return [{
+                "title": item.get("title", ""),
+                "url": item.get("url", ""),
+                "description": item.get("description", "")
+            } for item in data.get("web", {}).get("results", [])]
+        return []
\ No newline at end of file
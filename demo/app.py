@@ -29,6 +29,8 @@ env_path = root_dir / ".env"
 load_dotenv(env_path)
 
 from agents.orchestrator_enhanced import ProductionOrchestrator
+from agents.base import close_session
+from agents.web import close_brave_client
 from utils.system_monitor import get_system_thermal_info
 
 app = FastAPI(title="Magnus Smari | Oxford AI Summit 2025")
@@ -232,6 +234,16 @@ class PresentationDemo:
 # Create demo instance
 demo = PresentationDemo()
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Finish memory writes, persist memory state and release pooled connections."""
+    if hasattr(orchestrator, 'memory_system'):
+        await orchestrator.drain_pending_writes()
+        # Flushes pending metrics and saves the vector indexes so the next start can load them
+        orchestrator.memory_system.close()
+    await close_session()
+    await close_brave_client()
+
 @app.get("/")
 async def read_root():
     """Serve the main demo page."""
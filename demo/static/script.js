@@ -254,6 +254,11 @@ class LocalMindDashboard {
                 this.addTimelineEvent('Initializing research system', 'info');
                 break;
                 
+            case 'batch':
+                // Several events coalesced into one frame, in order
+                data.events.forEach(event => this.handleWebSocketMessage(event));
+                break;
+                
             case 'phase':
                 // Handle phase messages from backend
                 if (data.agent) {